@@ -0,0 +1,215 @@
+""" Capture slow `/pack` requests and replay them offline.
+
+When the server is started with `PACKAIDE_CAPTURE_THRESHOLD` set (in seconds), every `/pack` request which takes
+longer is saved as a redacted, gzip compressed JSON file, along with its timing breakdown, the number of
+`packaide.pack` iterations, and the error which failed it, if any. Only the newest `PACKAIDE_CAPTURE_CAPACITY`
+captures are kept in `PACKAIDE_CAPTURE_DIR`.
+
+Captured requests are rerun locally against `perform_pack` with:
+    python capture.py replay CAPTURE_DIR --json current.json
+
+Timings from another code version are compared by passing its results:
+    python capture.py replay CAPTURE_DIR --compare baseline.json
+"""
+import argparse
+import gzip
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+import xml.etree.ElementTree as et
+from typing import Optional
+
+from geometry import local_name
+from utils import combine_svg, generate_sheet, perform_pack, sort_shapes
+
+_SUFFIX = '.json.gz'
+
+# elements which may carry names, labels, or other identifying text, and do not affect nesting
+_REDACTED_ELEMENTS = {'title', 'desc', 'metadata', 'text', 'style', 'script'}
+
+# attributes which describe geometry. Every other attribute is removed from captured shapes.
+_GEOMETRY_ATTRIBUTES = {'x', 'y', 'width', 'height', 'cx', 'cy', 'r', 'rx', 'ry', 'x1', 'y1', 'x2', 'y2',
+                        'points', 'd', 'transform', 'viewBox'}
+
+
+def capture_files(directory: str) -> list[str]:
+    """ Return the paths of every capture in a directory, oldest first. """
+    names = sorted(name for name in os.listdir(directory) if name.endswith(_SUFFIX))
+    return [os.path.join(directory, name) for name in names]
+
+
+def _redact_element(element: et.Element) -> None:
+    for child in list(element):
+        if local_name(child) in _REDACTED_ELEMENTS:
+            element.remove(child)
+        else:
+            _redact_element(child)
+
+    for key in list(element.attrib):
+        if key not in _GEOMETRY_ATTRIBUTES:
+            del element.attrib[key]
+    element.text = None
+    element.tail = None
+
+
+def redact_svg(svg: str) -> str:
+    """ Remove everything but geometry from an SVG string.
+
+    Text, titles, descriptions and metadata are dropped, as are ids, classes, styles and any other non-geometric
+    attribute, so captures keep the shapes which were nested without identifying the customer or part.
+
+    Example:
+        >>> redact_svg('<svg><title>Part 7</title><rect id="a" width="1" height="2" /></svg>')
+        '<svg><rect width="1" height="2" /></svg>'
+    """
+    root = et.fromstring(svg)
+    _redact_element(root)
+    return et.tostring(root).decode('utf8')
+
+
+class CaptureBuffer:
+    """ A bounded, on-disk ring buffer of captured requests.
+
+    Parameters:
+        directory (str): Where captures are written. Created if it does not exist.
+        capacity (int): The number of captures kept. The oldest captures are deleted first.
+    """
+
+    def __init__(self, directory: str, capacity: int):
+        self.directory = directory
+        self.capacity = capacity
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def save(self, request: dict, timings: dict, iterations: Optional[int], error: Optional[str] = None) -> str:
+        """ Redact and save a request, then trim the buffer to its capacity. Returns the path of the capture.
+
+        `error` is the message of the exception which failed the request, if any.
+        """
+        shapes = []
+        for shape in request['shapes']:
+            try:
+                shapes.append(redact_svg(shape))
+            except et.ParseError:
+                # a malformed shape cannot be redacted, so it is left out
+                continue
+        capture = {
+            'captured': time.time(),
+            'request': dict(request, shapes=shapes),
+            'timings': timings,
+            'iterations': iterations,
+            'error': error,
+        }
+
+        # names sort by capture time; the random suffix keeps concurrent captures from colliding
+        name = '{:020d}-{}{}'.format(time.time_ns(), uuid.uuid4().hex[:8], _SUFFIX)
+        path = os.path.join(self.directory, name)
+        with gzip.open(path, 'wt', encoding='utf8') as f:
+            json.dump(capture, f)
+
+        with self._lock:
+            files = capture_files(self.directory)
+            for old in files[:max(0, len(files) - self.capacity)]:
+                try:
+                    os.remove(old)
+                except FileNotFoundError:
+                    pass
+
+        return path
+
+
+def load_capture(path: str) -> dict:
+    with gzip.open(path, 'rt', encoding='utf8') as f:
+        return json.load(f)
+
+
+def replay_capture(capture: dict) -> dict:
+    """ Rerun a captured request against `perform_pack` and return the timing of each step. """
+    request = capture['request']
+    timings = {}
+    stats = {}
+
+    start = time.perf_counter()
+    sheet = generate_sheet(width=request['width'], height=request['height'])
+    shapes = combine_svg(request['shapes'])
+    if request.get('sort') is not None:
+        shapes, _ = sort_shapes(shapes, request['sort'])
+    timings['prepare'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    error = None
+    try:
+        sheets = perform_pack(shapes, sheet,
+                              tolerance=request['tolerance'],
+                              offset=request['offset'],
+                              rotations=request['rotations'],
+                              stats=stats,
+                              progressive=request.get('progressive', False))
+    except ValueError as e:
+        sheets = []
+        error = str(e)
+    timings['pack'] = time.perf_counter() - start
+    timings['total'] = timings['prepare'] + timings['pack']
+
+    return {
+        'timings': timings,
+        'iterations': stats.get('iterations'),
+        'sheet_count': len(sheets),
+        'error': error,
+    }
+
+
+def replay(directory: str, repeat: int = 1) -> dict[str, dict]:
+    """ Replay every capture in a directory, keeping the fastest of `repeat` runs of each. """
+    reports = {}
+    for path in capture_files(directory):
+        capture = load_capture(path)
+        runs = [replay_capture(capture) for _ in range(repeat)]
+        report = min(runs, key=lambda run: run['timings']['total'])
+        report['captured'] = {'timings': capture['timings'], 'iterations': capture['iterations'],
+                              'error': capture.get('error')}
+        reports[os.path.basename(path)] = report
+    return reports
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    replay_parser = commands.add_parser('replay', help='rerun captured requests against perform_pack')
+    replay_parser.add_argument('directory', help='directory holding captured requests')
+    replay_parser.add_argument('--repeat', type=int, default=1, help='runs of each capture; the fastest is kept')
+    replay_parser.add_argument('--json', dest='json_path', help='write the replay results to this file')
+    replay_parser.add_argument('--compare', help='results of a previous replay to compare timings against')
+    args = parser.parse_args(argv)
+
+    reports = replay(args.directory, args.repeat)
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    for name, report in reports.items():
+        line = '{} pack={:.3f}s iterations={} sheets={}'.format(
+            name, report['timings']['pack'], report['iterations'], report['sheet_count'])
+        if report['error']:
+            line += ' error="{}"'.format(report['error'])
+        if name in baseline:
+            before = baseline[name]['timings']['pack']
+            after = report['timings']['pack']
+            line += ' baseline={:.3f}s change={:+.1%}'.format(before, (after - before) / before if before else 0.0)
+        print(line)
+
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump(reports, f, indent=2)
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,76 @@
+import hashlib
+import json
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Optional
+
+IDEMPOTENCY_CONFLICT = "Idempotency-Key is already in use by a request with a different body"
+
+
+class IdempotencyConflict(Exception):
+    """ Raised when an `Idempotency-Key` in flight is reused with a different request body. """
+
+
+def request_key(body: dict) -> str:
+    """ Return a canonical hash of a request body. Key order does not affect the hash.
+
+    Example:
+        >>> request_key({'a': 1, 'b': 2}) == request_key({'b': 2, 'a': 1})
+        True
+    """
+    canonical = json.dumps(body, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode('utf8')).hexdigest()
+
+
+class Coalescer:
+    """ Share a single computation between identical requests which are in flight at the same time.
+
+    The first caller for a key runs the computation, and any caller arriving with the same key before it finishes
+    waits for, and receives, the same result. Exceptions are shared in the same way. Once the computation finishes
+    the key is forgotten, so later requests are computed again; nothing is cached.
+
+    A client may also name its request with an idempotency key. While the request is in flight, the name may only
+    be reused for the same key, so a client retrying with a changed body is told rather than silently receiving
+    the result of its earlier request.
+
+    Coalescing is per process, so identical requests handled by different uvicorn workers are not shared.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._in_flight: dict[str, Future] = {}
+        self._idempotency_keys: dict[str, str] = {}
+
+    def run(self, key: str, compute: Callable[[], Any], idempotency_key: Optional[str] = None) -> tuple[Any, bool]:
+        """ Run `compute`, or attach to an identical computation which is already running.
+
+        Returns:
+            The result, and whether it was shared from another request.
+
+        Raises:
+            `IdempotencyConflict` when `idempotency_key` is in flight for a different key
+        """
+        with self._lock:
+            if idempotency_key is not None:
+                claimed = self._idempotency_keys.setdefault(idempotency_key, key)
+                if claimed != key:
+                    raise IdempotencyConflict(IDEMPOTENCY_CONFLICT)
+
+            future = self._in_flight.get(key)
+            shared = future is not None
+            if not shared:
+                future = Future()
+                self._in_flight[key] = future
+
+        if not shared:
+            try:
+                future.set_result(compute())
+            except BaseException as e:
+                future.set_exception(e)
+            finally:
+                with self._lock:
+                    del self._in_flight[key]
+                    for name in [name for name, claimed in self._idempotency_keys.items() if claimed == key]:
+                        del self._idempotency_keys[name]
+
+        return future.result(), shared
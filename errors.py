@@ -0,0 +1,3 @@
+# messages of the `ValueError`s raised when shapes cannot be packed, shared by every packer
+NO_SHAPE_FITS = "Sheet size is too small for shapes"
+ONE_SHAPE_TOO_BIG = "One shape is too large for sheet"
@@ -0,0 +1,427 @@
+import math
+import re
+import xml.etree.ElementTree as et
+
+Point = tuple[float, float]
+Matrix = tuple[float, float, float, float, float, float]
+
+IDENTITY: Matrix = (1.0, 0.0, 0.0, 1.0, 0.0, 0.0)
+
+# number of segments used when flattening curves and ellipses into polygons
+CURVE_SEGMENTS = 16
+ELLIPSE_SEGMENTS = 32
+
+_NUMBER = re.compile(r'[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?')
+_PATH_TOKEN = re.compile(r'[MmLlHhVvCcSsQqTtAaZz]|[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?')
+_TRANSFORM = re.compile(r'(matrix|translate|scale|rotate|skewX|skewY)\s*\(([^)]*)\)')
+
+# arguments consumed by each path command
+_PATH_ARGS = {'M': 2, 'L': 2, 'H': 1, 'V': 1, 'C': 6, 'S': 4, 'Q': 4, 'T': 2, 'A': 7, 'Z': 0}
+
+# elements which never produce any geometry
+_NON_GEOMETRIC = {'defs', 'title', 'desc', 'metadata', 'style', 'script', 'text', 'clipPath', 'mask', 'symbol'}
+
+
+def local_name(element: et.Element) -> str:
+    """ Return the tag of an element without its XML namespace. """
+    tag = element.tag
+    if not isinstance(tag, str):
+        return ''
+    return tag.rsplit('}', 1)[-1]
+
+
+def _length(value: str | None, default: float = 0.0) -> float:
+    """ Parse an SVG length attribute, ignoring any unit suffix. """
+    if value is None:
+        return default
+    match = _NUMBER.match(value.strip())
+    return float(match.group()) if match else default
+
+
+def multiply(m1: Matrix, m2: Matrix) -> Matrix:
+    """ Return the affine matrix which applies `m2` first, then `m1`. """
+    a1, b1, c1, d1, e1, f1 = m1
+    a2, b2, c2, d2, e2, f2 = m2
+    return (a1 * a2 + c1 * b2,
+            b1 * a2 + d1 * b2,
+            a1 * c2 + c1 * d2,
+            b1 * c2 + d1 * d2,
+            a1 * e2 + c1 * f2 + e1,
+            b1 * e2 + d1 * f2 + f1)
+
+
+def apply(matrix: Matrix, point: Point) -> Point:
+    """ Transform a single point by an affine matrix. """
+    a, b, c, d, e, f = matrix
+    x, y = point
+    return a * x + c * y + e, b * x + d * y + f
+
+
+def parse_transform(value: str | None) -> Matrix:
+    """ Parse the `transform` attribute of an SVG element into an affine matrix.
+
+    Example:
+        >>> parse_transform('translate(10, 20)')
+        (1.0, 0.0, 0.0, 1.0, 10.0, 20.0)
+    """
+    matrix = IDENTITY
+    if not value:
+        return matrix
+
+    for name, raw_args in _TRANSFORM.findall(value):
+        args = [float(arg) for arg in _NUMBER.findall(raw_args)]
+        if name == 'matrix' and len(args) == 6:
+            step = tuple(args)
+        elif name == 'translate' and args:
+            step = (1.0, 0.0, 0.0, 1.0, args[0], args[1] if len(args) > 1 else 0.0)
+        elif name == 'scale' and args:
+            step = (args[0], 0.0, 0.0, args[1] if len(args) > 1 else args[0], 0.0, 0.0)
+        elif name == 'rotate' and args:
+            angle = math.radians(args[0])
+            cos, sin = math.cos(angle), math.sin(angle)
+            step = (cos, sin, -sin, cos, 0.0, 0.0)
+            if len(args) == 3:
+                cx, cy = args[1], args[2]
+                step = multiply(multiply((1.0, 0.0, 0.0, 1.0, cx, cy), step), (1.0, 0.0, 0.0, 1.0, -cx, -cy))
+        elif name == 'skewX' and args:
+            step = (1.0, 0.0, math.tan(math.radians(args[0])), 1.0, 0.0, 0.0)
+        elif name == 'skewY' and args:
+            step = (1.0, math.tan(math.radians(args[0])), 0.0, 1.0, 0.0, 0.0)
+        else:
+            continue
+        matrix = multiply(matrix, step)
+
+    return matrix
+
+
+def _ellipse(cx: float, cy: float, rx: float, ry: float) -> list[Point]:
+    step = 2 * math.pi / ELLIPSE_SEGMENTS
+    return [(cx + rx * math.cos(i * step), cy + ry * math.sin(i * step)) for i in range(ELLIPSE_SEGMENTS)]
+
+
+def _cubic(p0: Point, p1: Point, p2: Point, p3: Point) -> list[Point]:
+    points = []
+    for i in range(1, CURVE_SEGMENTS + 1):
+        t = i / CURVE_SEGMENTS
+        u = 1 - t
+        points.append((u ** 3 * p0[0] + 3 * u * u * t * p1[0] + 3 * u * t * t * p2[0] + t ** 3 * p3[0],
+                       u ** 3 * p0[1] + 3 * u * u * t * p1[1] + 3 * u * t * t * p2[1] + t ** 3 * p3[1]))
+    return points
+
+
+def _quadratic(p0: Point, p1: Point, p2: Point) -> list[Point]:
+    points = []
+    for i in range(1, CURVE_SEGMENTS + 1):
+        t = i / CURVE_SEGMENTS
+        u = 1 - t
+        points.append((u * u * p0[0] + 2 * u * t * p1[0] + t * t * p2[0],
+                       u * u * p0[1] + 2 * u * t * p1[1] + t * t * p2[1]))
+    return points
+
+
+def _arc(start: Point, rx: float, ry: float, rotation: float, large: bool, sweep: bool, end: Point) -> list[Point]:
+    """ Flatten an elliptical arc using the endpoint to center conversion from the SVG specification. """
+    if start == end:
+        return []
+    rx, ry = abs(rx), abs(ry)
+    if rx == 0 or ry == 0:
+        return [end]
+
+    phi = math.radians(rotation)
+    cos_phi, sin_phi = math.cos(phi), math.sin(phi)
+    dx, dy = (start[0] - end[0]) / 2, (start[1] - end[1]) / 2
+    x1 = cos_phi * dx + sin_phi * dy
+    y1 = -sin_phi * dx + cos_phi * dy
+
+    # scale up radii which are too small to span both endpoints
+    scale = (x1 * x1) / (rx * rx) + (y1 * y1) / (ry * ry)
+    if scale > 1:
+        rx, ry = rx * math.sqrt(scale), ry * math.sqrt(scale)
+
+    numerator = rx * rx * ry * ry - rx * rx * y1 * y1 - ry * ry * x1 * x1
+    denominator = rx * rx * y1 * y1 + ry * ry * x1 * x1
+    factor = math.sqrt(max(0.0, numerator / denominator)) if denominator else 0.0
+    if large == sweep:
+        factor = -factor
+    cx1 = factor * rx * y1 / ry
+    cy1 = -factor * ry * x1 / rx
+    cx = cos_phi * cx1 - sin_phi * cy1 + (start[0] + end[0]) / 2
+    cy = sin_phi * cx1 + cos_phi * cy1 + (start[1] + end[1]) / 2
+
+    theta = math.atan2((y1 - cy1) / ry, (x1 - cx1) / rx)
+    delta = math.atan2((-y1 - cy1) / ry, (-x1 - cx1) / rx) - theta
+    if sweep and delta < 0:
+        delta += 2 * math.pi
+    elif not sweep and delta > 0:
+        delta -= 2 * math.pi
+
+    points = []
+    for i in range(1, CURVE_SEGMENTS + 1):
+        angle = theta + delta * i / CURVE_SEGMENTS
+        x, y = rx * math.cos(angle), ry * math.sin(angle)
+        points.append((cos_phi * x - sin_phi * y + cx, sin_phi * x + cos_phi * y + cy))
+    points[-1] = end
+    return points
+
+
+def parse_path(d: str) -> list[list[Point]]:
+    """ Flatten SVG path data into a list of polygons, one for each subpath.
+
+    Curves and arcs are approximated with `CURVE_SEGMENTS` line segments.
+
+    Example:
+        >>> parse_path('M 0 0 H 10 V 10 H 0 Z')
+        [[(0.0, 0.0), (10.0, 0.0), (10.0, 10.0), (0.0, 10.0)]]
+    """
+    tokens = _PATH_TOKEN.findall(d or '')
+    subpaths: list[list[Point]] = []
+    current: list[Point] = []
+    x = y = start_x = start_y = 0.0
+    last_control: Point | None = None
+    last_command = ''
+    command = ''
+    i = 0
+
+    while i < len(tokens):
+        if tokens[i].isalpha():
+            command = tokens[i]
+            i += 1
+        elif not command:
+            # path data must start with a command
+            break
+
+        upper = command.upper()
+        relative = command.islower()
+        count = _PATH_ARGS[upper]
+        raw_args = tokens[i:i + count]
+        if len(raw_args) < count or any(token.isalpha() for token in raw_args):
+            # malformed path data, keep whatever has been parsed so far
+            break
+        args = [float(token) for token in raw_args]
+        i += count
+        ox, oy = (x, y) if relative else (0.0, 0.0)
+
+        if upper == 'M':
+            if len(current) > 1:
+                subpaths.append(current)
+            x, y = args[0] + ox, args[1] + oy
+            start_x, start_y = x, y
+            current = [(x, y)]
+            # subsequent coordinate pairs are implicit line-to commands
+            command = 'l' if relative else 'L'
+        elif upper == 'Z':
+            if len(current) > 1:
+                subpaths.append(current)
+            x, y = start_x, start_y
+            current = [(x, y)]
+            command = ''
+        elif upper == 'L':
+            x, y = args[0] + ox, args[1] + oy
+            current.append((x, y))
+        elif upper == 'H':
+            x = args[0] + ox
+            current.append((x, y))
+        elif upper == 'V':
+            y = args[0] + oy
+            current.append((x, y))
+        elif upper in ('C', 'S'):
+            if upper == 'C':
+                c1 = (args[0] + ox, args[1] + oy)
+                rest = args[2:]
+            else:
+                c1 = (2 * x - last_control[0], 2 * y - last_control[1]) \
+                    if last_control and last_command in ('C', 'S') else (x, y)
+                rest = args
+            c2 = (rest[0] + ox, rest[1] + oy)
+            end = (rest[2] + ox, rest[3] + oy)
+            current.extend(_cubic((x, y), c1, c2, end))
+            last_control = c2
+            x, y = end
+        elif upper in ('Q', 'T'):
+            if upper == 'Q':
+                c1 = (args[0] + ox, args[1] + oy)
+                end = (args[2] + ox, args[3] + oy)
+            else:
+                c1 = (2 * x - last_control[0], 2 * y - last_control[1]) \
+                    if last_control and last_command in ('Q', 'T') else (x, y)
+                end = (args[0] + ox, args[1] + oy)
+            current.extend(_quadratic((x, y), c1, end))
+            last_control = c1
+            x, y = end
+        elif upper == 'A':
+            end = (args[5] + ox, args[6] + oy)
+            current.extend(_arc((x, y), args[0], args[1], args[2], bool(args[3]), bool(args[4]), end))
+            x, y = end
+
+        last_command = upper
+        if upper not in 'CSQT':
+            last_control = None
+
+    if len(current) > 1:
+        subpaths.append(current)
+
+    # drop closing points which repeat the start of the polygon
+    for polygon in subpaths:
+        if len(polygon) > 1 and polygon[0] == polygon[-1]:
+            polygon.pop()
+
+    return subpaths
+
+
+def _points_attribute(value: str | None) -> list[Point]:
+    numbers = [float(n) for n in _NUMBER.findall(value or '')]
+    return list(zip(numbers[0::2], numbers[1::2]))
+
+
+def element_polygons(element: et.Element) -> list[list[Point]]:
+    """ Return the untransformed outline of a single (non-group) SVG shape element. """
+    name = local_name(element)
+    attrib = element.attrib
+
+    if name == 'rect':
+        x, y = _length(attrib.get('x')), _length(attrib.get('y'))
+        width, height = _length(attrib.get('width')), _length(attrib.get('height'))
+        return [[(x, y), (x + width, y), (x + width, y + height), (x, y + height)]]
+    elif name == 'circle':
+        r = _length(attrib.get('r'))
+        return [_ellipse(_length(attrib.get('cx')), _length(attrib.get('cy')), r, r)]
+    elif name == 'ellipse':
+        return [_ellipse(_length(attrib.get('cx')), _length(attrib.get('cy')),
+                         _length(attrib.get('rx')), _length(attrib.get('ry')))]
+    elif name == 'line':
+        return [[(_length(attrib.get('x1')), _length(attrib.get('y1'))),
+                 (_length(attrib.get('x2')), _length(attrib.get('y2')))]]
+    elif name in ('polygon', 'polyline'):
+        return [_points_attribute(attrib.get('points'))]
+    elif name == 'path':
+        return parse_path(attrib.get('d', ''))
+
+    return []
+
+
+def iter_shapes(element: et.Element, matrix: Matrix = IDENTITY):
+    """ Yield every leaf shape below `element` along with its accumulated transform.
+
+    Groups are descended into, mirroring how `packaide` treats each leaf element as a separate part.
+    """
+    name = local_name(element)
+    if name in _NON_GEOMETRIC:
+        return
+
+    matrix = multiply(matrix, parse_transform(element.attrib.get('transform')))
+    if name in ('g', 'svg', 'a'):
+        for child in element:
+            yield from iter_shapes(child, matrix)
+    elif name:
+        yield element, matrix
+
+
+def outlines(element: et.Element) -> list[list[Point]]:
+    """ Return every transformed polygon which makes up `element`, including all nested shapes. """
+    polygons = []
+    for shape, matrix in iter_shapes(element):
+        for polygon in element_polygons(shape):
+            polygons.append([apply(matrix, point) for point in polygon])
+    return polygons
+
+
+def polygon_area(polygon: list[Point]) -> float:
+    """ Return the absolute area of a simple polygon using the shoelace formula. """
+    total = 0.0
+    for (x1, y1), (x2, y2) in zip(polygon, polygon[1:] + polygon[:1]):
+        total += x1 * y2 - x2 * y1
+    return abs(total) / 2
+
+
+def bounding_box(points: list[Point]) -> tuple[float, float, float, float]:
+    """ Return the `(min_x, min_y, max_x, max_y)` bounding box of a list of points. """
+    if not points:
+        return 0.0, 0.0, 0.0, 0.0
+    xs = [p[0] for p in points]
+    ys = [p[1] for p in points]
+    return min(xs), min(ys), max(xs), max(ys)
+
+
+def convex_hull(points: list[Point]) -> list[Point]:
+    """ Return the convex hull of a list of points in counter-clockwise order (Andrew's monotone chain). """
+    points = sorted(set(points))
+    if len(points) <= 2:
+        return points
+
+    def cross(o: Point, a: Point, b: Point) -> float:
+        return (a[0] - o[0]) * (b[1] - o[1]) - (a[1] - o[1]) * (b[0] - o[0])
+
+    lower: list[Point] = []
+    for point in points:
+        while len(lower) >= 2 and cross(lower[-2], lower[-1], point) <= 0:
+            lower.pop()
+        lower.append(point)
+
+    upper: list[Point] = []
+    for point in reversed(points):
+        while len(upper) >= 2 and cross(upper[-2], upper[-1], point) <= 0:
+            upper.pop()
+        upper.append(point)
+
+    return lower[:-1] + upper[:-1]
+
+
+def shape_area(element: et.Element) -> float:
+    """ Return the total outline area of an element. Holes are not subtracted. """
+    return sum(polygon_area(polygon) for polygon in outlines(element))
+
+
+def bbox_max_side(element: et.Element) -> float:
+    """ Return the longest side of the bounding box of an element. """
+    min_x, min_y, max_x, max_y = bounding_box([p for polygon in outlines(element) for p in polygon])
+    return max(max_x - min_x, max_y - min_y)
+
+
+def hull_area(element: et.Element) -> float:
+    """ Return the area of the convex hull of an element. """
+    return polygon_area(convex_hull([p for polygon in outlines(element) for p in polygon]))
+
+
+def _segment_distance(point: Point, start: Point, end: Point) -> float:
+    dx, dy = end[0] - start[0], end[1] - start[1]
+    if dx == 0 and dy == 0:
+        return math.hypot(point[0] - start[0], point[1] - start[1])
+    t = max(0.0, min(1.0, ((point[0] - start[0]) * dx + (point[1] - start[1]) * dy) / (dx * dx + dy * dy)))
+    return math.hypot(point[0] - start[0] - t * dx, point[1] - start[1] - t * dy)
+
+
+def _simplify_open(points: list[Point], epsilon: float) -> list[Point]:
+    # iterative Ramer-Douglas-Peucker, keeping the first and last point
+    keep = [False] * len(points)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        first, last = stack.pop()
+        index, distance = 0, 0.0
+        for i in range(first + 1, last):
+            d = _segment_distance(points[i], points[first], points[last])
+            if d > distance:
+                index, distance = i, d
+        if distance > epsilon:
+            keep[index] = True
+            stack.append((first, index))
+            stack.append((index, last))
+    return [point for point, kept in zip(points, keep) if kept]
+
+
+def simplify(polygon: list[Point], epsilon: float) -> list[Point]:
+    """ Remove vertices of a closed polygon which lie within `epsilon` of its simplified outline.
+
+    Example:
+        >>> simplify([(0, 0), (5, 0.01), (10, 0), (10, 10), (0, 10)], 0.1)
+        [(0, 0), (10, 0), (10, 10), (0, 10)]
+    """
+    if len(polygon) <= 3:
+        return list(polygon)
+
+    # split the ring at the vertex furthest from the first, so each half is simplified as an open line
+    far = max(range(len(polygon)), key=lambda i: math.hypot(polygon[i][0] - polygon[0][0],
+                                                            polygon[i][1] - polygon[0][1]))
+    first_half = _simplify_open(polygon[:far + 1], epsilon)
+    second_half = _simplify_open(polygon[far:] + [polygon[0]], epsilon)
+    return first_half + second_half[1:-1]
@@ -0,0 +1,207 @@
+import hashlib
+import os
+import tempfile
+import threading
+import xml.etree.ElementTree as et
+from collections import OrderedDict
+from typing import NamedTuple, Optional
+
+from geometry import Point, bounding_box, outlines, polygon_area, simplify
+
+UNKNOWN_SHAPE = "Unknown shape id: {}"
+INVALID_SHAPE = "Shape is not a valid SVG"
+SHAPE_TOO_LARGE = "Shape is larger than the shape library"
+
+# distance within which outline vertices are merged when simplifying
+SIMPLIFY_EPSILON = 0.5
+
+
+def is_reference(shape: str) -> bool:
+    """ Return whether an entry of `NestingRequest.shapes` is a library id rather than inline SVG.
+
+    Example:
+        >>> is_reference('<svg></svg>'), is_reference('3f2a')
+        (False, True)
+    """
+    return not shape.lstrip().startswith('<')
+
+
+class Shape(NamedTuple):
+    """ A registered shape, with its geometry measured once when it is registered. """
+    id: str
+    svg: str
+    elements: list[et.Element]
+    area: float
+    bbox: tuple[float, float, float, float]
+    outline: list[list[Point]]
+
+    def describe(self) -> dict:
+        """ The shape metadata returned to clients. """
+        return {
+            'id': self.id,
+            'area': self.area,
+            'bbox': list(self.bbox),
+            'outline': [[list(point) for point in polygon] for polygon in self.outline],
+        }
+
+
+def _measure(shape_id: str, svg: str) -> Shape:
+    root = et.fromstring(svg)
+    polygons = outlines(root)
+    return Shape(
+        id=shape_id,
+        svg=svg,
+        elements=list(root),
+        area=sum(polygon_area(polygon) for polygon in polygons),
+        bbox=bounding_box([point for polygon in polygons for point in polygon]),
+        outline=[simplify(polygon, SIMPLIFY_EPSILON) for polygon in polygons],
+    )
+
+
+class ShapeLibrary:
+    """ A registry of parts, so clients can reference a shape by id rather than uploading its SVG every time.
+
+    Shapes are identified by the hash of their canonical XML, so registering the same shape twice returns the same
+    id. Parsed shapes are kept in an LRU cache of `capacity` shapes, and every shape is also written to `directory`
+    so it survives eviction from the cache and server restarts.
+
+    The directory is limited to `disk_capacity` bytes. Once it is exceeded, the least recently used shapes are
+    deleted, and requests which reference them fail until they are registered again.
+
+    Parameters:
+        directory (str): Where registered shapes are written. Created if it does not exist.
+        capacity (int): The number of parsed shapes kept in memory.
+        disk_capacity (int): The number of bytes of shapes kept on disk.
+    """
+
+    def __init__(self, directory: str, capacity: int, disk_capacity: int):
+        self.directory = directory
+        self.capacity = capacity
+        self.disk_capacity = disk_capacity
+        self._cache: OrderedDict[str, Shape] = OrderedDict()
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._disk_usage = sum(size for _, _, size in self._files())
+
+    def _path(self, shape_id: str) -> str:
+        return os.path.join(self.directory, '{}.svg'.format(shape_id))
+
+    def _files(self) -> list[tuple[float, str, int]]:
+        """ Return the last use time, id, and size of every shape on disk. """
+        files = []
+        for entry in os.scandir(self.directory):
+            if not entry.name.endswith('.svg'):
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_mtime, entry.name[:-len('.svg')], stat.st_size))
+        return files
+
+    def _touch(self, shape_id: str) -> None:
+        """ Mark a shape as used, so it is evicted from disk last. """
+        try:
+            os.utime(self._path(shape_id))
+        except OSError:
+            pass
+
+    def _evict(self) -> None:
+        """ Delete the least recently used shapes until the directory fits in `disk_capacity`. """
+        with self._lock:
+            if self._disk_usage <= self.disk_capacity:
+                return
+
+            # other workers may share the directory, so measure it rather than trusting the running total
+            files = sorted(self._files())
+            self._disk_usage = sum(size for _, _, size in files)
+            for _, shape_id, size in files:
+                if self._disk_usage <= self.disk_capacity:
+                    break
+                try:
+                    os.remove(self._path(shape_id))
+                except FileNotFoundError:
+                    pass
+                self._disk_usage -= size
+                self._cache.pop(shape_id, None)
+
+    def _remember(self, shape: Shape) -> None:
+        with self._lock:
+            self._cache[shape.id] = shape
+            self._cache.move_to_end(shape.id)
+            while len(self._cache) > self.capacity:
+                self._cache.popitem(last=False)
+
+    def register(self, svg: str) -> Shape:
+        """ Register a shape and return it. Registering an existing shape returns the stored copy.
+
+        Raises:
+            `ValueError` when:
+                - The SVG cannot be parsed
+                - The shape alone is larger than `disk_capacity`
+        """
+        try:
+            canonical = et.canonicalize(svg, strip_text=True)
+        except et.ParseError:
+            raise ValueError(INVALID_SHAPE)
+        data = canonical.encode('utf8')
+        if len(data) > self.disk_capacity:
+            raise ValueError(SHAPE_TOO_LARGE)
+        shape_id = hashlib.sha256(data).hexdigest()
+
+        existing = self.get(shape_id)
+        if existing is not None:
+            return existing
+
+        shape = _measure(shape_id, canonical)
+
+        # write to a temporary file first, so a partially written shape is never read
+        descriptor, staging = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(descriptor, 'wb') as f:
+            f.write(data)
+        os.replace(staging, self._path(shape_id))
+
+        with self._lock:
+            self._disk_usage += len(data)
+        self._remember(shape)
+        self._evict()
+        return shape
+
+    def get(self, shape_id: str) -> Optional[Shape]:
+        """ Return a registered shape, loading it from disk when it is not cached. """
+        with self._lock:
+            shape = self._cache.get(shape_id)
+            if shape is not None:
+                self._cache.move_to_end(shape_id)
+        if shape is not None:
+            self._touch(shape_id)
+            return shape
+
+        # ids are hex digests; reject anything which could escape the library directory
+        if not shape_id.isalnum():
+            return None
+        try:
+            with open(self._path(shape_id), encoding='utf8') as f:
+                svg = f.read()
+        except OSError:
+            return None
+
+        self._touch(shape_id)
+        shape = _measure(shape_id, svg)
+        self._remember(shape)
+        return shape
+
+    def resolve(self, shape_id: str) -> Shape:
+        """ Return a registered shape.
+
+        Raises:
+            `ValueError` when no shape is registered with the id
+        """
+        shape = self.get(shape_id.strip())
+        if shape is None:
+            raise ValueError(UNKNOWN_SHAPE.format(shape_id.strip()))
+        return shape
+
+    def expand(self, shapes: list[str]) -> list[str]:
+        """ Replace every library id in a list of shapes with its SVG. """
+        return [self.resolve(shape).svg if is_reference(shape) else shape for shape in shapes]
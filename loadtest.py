@@ -0,0 +1,314 @@
+""" Load-testing harness for the Packaide server.
+
+Starts the app locally with `uvicorn`, replays a mix of small and large `NestingRequest` bodies at one or more
+concurrency levels, and reports throughput, latency percentiles, error rates, and the CPU utilization of each
+server worker.
+
+Example:
+    python loadtest.py --workers 2 --concurrency 1,4,8 --requests 50 --mix small=0.8,large=0.2
+
+Pass `--url` to test an already running server instead of starting one. CPU utilization is only reported for
+servers started by this script, and only on platforms which provide `/proc`.
+"""
+import argparse
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+# parameters passed with every generated request
+TOLERANCE = 0.5
+OFFSET = 2
+ROTATIONS = 4
+
+
+def _rect(width: float, height: float) -> str:
+    return '<rect width="{}" height="{}" />'.format(width, height)
+
+
+def _circle(radius: float) -> str:
+    return '<circle r="{}" />'.format(radius)
+
+
+def small_request(rng: random.Random) -> dict:
+    """ A request for a handful of simple parts on a single sheet. One part is round, so `packaide` is used. """
+    shapes = [_rect(rng.randint(20, 80), rng.randint(20, 80)) for _ in range(rng.randint(1, 4))]
+    shapes.append(_circle(rng.randint(10, 40)))
+    return {
+        'width': 10,
+        'height': 10,
+        'shapes': ['<svg>{}</svg>'.format(''.join(shapes))],
+        'tolerance': TOLERANCE,
+        'offset': OFFSET,
+        'rotations': ROTATIONS,
+    }
+
+
+def rects_request(rng: random.Random) -> dict:
+    """ A request for many rectangular parts, which takes the rectangle packer rather than `packaide`. """
+    shapes = [_rect(rng.randint(20, 200), rng.randint(20, 200)) for _ in range(rng.randint(10, 40))]
+    return {
+        'width': 12,
+        'height': 12,
+        'shapes': ['<svg>{}</svg>'.format(''.join(shapes))],
+        'tolerance': TOLERANCE,
+        'offset': OFFSET,
+        'rotations': ROTATIONS,
+    }
+
+
+def large_request(rng: random.Random) -> dict:
+    """ A request for many mixed parts which spans several sheets. """
+    svgs = []
+    for _ in range(rng.randint(4, 8)):
+        shapes = []
+        for _ in range(rng.randint(5, 10)):
+            if rng.random() < 0.7:
+                shapes.append(_rect(rng.randint(20, 200), rng.randint(20, 200)))
+            else:
+                shapes.append(_circle(rng.randint(10, 80)))
+        svgs.append('<svg>{}</svg>'.format(''.join(shapes)))
+    return {
+        'width': 12,
+        'height': 12,
+        'shapes': svgs,
+        'tolerance': TOLERANCE,
+        'offset': OFFSET,
+        'rotations': ROTATIONS,
+    }
+
+
+GENERATORS = {
+    'small': small_request,
+    'rects': rects_request,
+    'large': large_request,
+}
+
+
+def parse_mix(value: str) -> dict[str, float]:
+    """ Parse a request mix such as `small=0.8,large=0.2` into normalized weights.
+
+    Example:
+        >>> parse_mix('small=3,large=1')
+        {'small': 0.75, 'large': 0.25}
+    """
+    weights = {}
+    for item in value.split(','):
+        name, _, weight = item.partition('=')
+        name = name.strip()
+        if name not in GENERATORS:
+            raise ValueError('Unknown request kind: {}'.format(name))
+        weights[name] = float(weight) if weight else 1.0
+
+    total = sum(weights.values())
+    if total <= 0:
+        raise ValueError('Request mix must have a positive total weight')
+    return {name: weight / total for name, weight in weights.items()}
+
+
+def percentile(values: list[float], q: float) -> float:
+    """ Return the `q`-th percentile of `values` using the nearest-rank method.
+
+    Example:
+        >>> percentile([1, 2, 3, 4], 50)
+        2
+    """
+    if not values:
+        return float('nan')
+    ordered = sorted(values)
+    rank = max(1, math.ceil(q / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def build_requests(mix: dict[str, float], count: int, seed: int) -> list[tuple[str, dict]]:
+    """ Generate `count` request bodies following the given mix. The same seed always gives the same requests. """
+    rng = random.Random(seed)
+    kinds = list(mix)
+    weights = [mix[kind] for kind in kinds]
+    requests = []
+    for _ in range(count):
+        kind = rng.choices(kinds, weights)[0]
+        requests.append((kind, GENERATORS[kind](rng)))
+    return requests
+
+
+def send(url: str, body: dict, timeout: float) -> tuple[float, int]:
+    """ POST a single request and return its latency in seconds and the HTTP status (0 on connection errors). """
+    data = json.dumps(body).encode('utf8')
+    request = urllib.request.Request(url, data=data, headers={'Content-Type': 'application/json'})
+
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            response.read()
+            status = response.status
+    except urllib.error.HTTPError as e:
+        status = e.code
+    except (urllib.error.URLError, OSError):
+        status = 0
+
+    return time.perf_counter() - start, status
+
+
+def _children(pid: int) -> list[int]:
+    """ Return the direct child processes of `pid` using `/proc`. """
+    children = []
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open('/proc/{}/stat'.format(entry)) as f:
+                stat = f.read()
+        except OSError:
+            continue
+        # the process name may contain spaces, so fields are counted after the closing parenthesis
+        fields = stat.rsplit(')', 1)[1].split()
+        if int(fields[1]) == pid:
+            children.append(int(entry))
+    return children
+
+
+def _cpu_seconds(pid: int) -> float | None:
+    """ Return the total user and system CPU time consumed by `pid`. """
+    try:
+        with open('/proc/{}/stat'.format(pid)) as f:
+            fields = f.read().rsplit(')', 1)[1].split()
+    except OSError:
+        return None
+    return (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+
+
+def worker_pids(server: subprocess.Popen | None) -> list[int]:
+    """ Return the processes which serve requests. With `--workers 1` uvicorn serves from the main process. """
+    if server is None or not os.path.isdir('/proc'):
+        return []
+    return _children(server.pid) or [server.pid]
+
+
+def cpu_snapshot(pids: list[int]) -> dict[int, float]:
+    snapshot = {}
+    for pid in pids:
+        seconds = _cpu_seconds(pid)
+        if seconds is not None:
+            snapshot[pid] = seconds
+    return snapshot
+
+
+def run_level(url: str, requests: list[tuple[str, dict]], concurrency: int, timeout: float,
+              pids: list[int]) -> dict:
+    """ Replay all requests at a single concurrency level and summarize the results. """
+    cpu_before = cpu_snapshot(pids)
+    start = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(lambda item: (item[0], *send(url, item[1], timeout)), requests))
+
+    elapsed = time.perf_counter() - start
+    cpu_after = cpu_snapshot(pids)
+
+    latencies = [latency for _, latency, status in results if status == 200]
+    errors = sum(1 for _, _, status in results if status != 200)
+
+    by_kind = {}
+    for kind in sorted({kind for kind, _, _ in results}):
+        kind_latencies = [latency for k, latency, status in results if k == kind and status == 200]
+        by_kind[kind] = {
+            'count': sum(1 for k, _, _ in results if k == kind),
+            'p50': percentile(kind_latencies, 50),
+            'p95': percentile(kind_latencies, 95),
+        }
+
+    return {
+        'concurrency': concurrency,
+        'requests': len(results),
+        'elapsed': elapsed,
+        'throughput': len(latencies) / elapsed if elapsed else 0.0,
+        'error_rate': errors / len(results) if results else 0.0,
+        'p50': percentile(latencies, 50),
+        'p95': percentile(latencies, 95),
+        'p99': percentile(latencies, 99),
+        'by_kind': by_kind,
+        'cpu': {pid: (cpu_after[pid] - cpu_before[pid]) / elapsed
+                for pid in cpu_after if pid in cpu_before and elapsed},
+    }
+
+
+def start_server(port: int, workers: int) -> subprocess.Popen:
+    """ Start the app with `uvicorn` and block until it accepts requests. """
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'main:app', '--port', str(port), '--workers', str(workers),
+         '--log-level', 'warning'],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+    )
+
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError('Server exited during startup')
+        try:
+            with urllib.request.urlopen('http://127.0.0.1:{}/openapi.json'.format(port), timeout=1):
+                return server
+        except (urllib.error.URLError, OSError):
+            time.sleep(0.2)
+
+    server.terminate()
+    raise RuntimeError('Server did not start within 30 seconds')
+
+
+def print_report(level: dict) -> None:
+    print('concurrency={concurrency} requests={requests} elapsed={elapsed:.2f}s '
+          'throughput={throughput:.2f} nests/s errors={error_rate:.1%}'.format(**level))
+    print('  latency p50={:.3f}s p95={:.3f}s p99={:.3f}s'.format(level['p50'], level['p95'], level['p99']))
+    for kind, stats in level['by_kind'].items():
+        print('  {:<6} n={:<4} p50={:.3f}s p95={:.3f}s'.format(kind, stats['count'], stats['p50'], stats['p95']))
+    for pid, utilization in sorted(level['cpu'].items()):
+        print('  worker {} cpu={:.1%}'.format(pid, utilization))
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', help='base URL of a running server; a local server is started when omitted')
+    parser.add_argument('--port', type=int, default=8765, help='port for the local server')
+    parser.add_argument('--workers', type=int, default=1, help='number of uvicorn workers for the local server')
+    parser.add_argument('--concurrency', default='1,4,8', help='comma separated concurrency levels')
+    parser.add_argument('--requests', type=int, default=50, help='requests sent at each concurrency level')
+    parser.add_argument('--mix', default='small=0.8,large=0.2', help='weighted mix of request kinds')
+    parser.add_argument('--seed', type=int, default=0, help='seed used to generate requests')
+    parser.add_argument('--timeout', type=float, default=120, help='per request timeout in seconds')
+    parser.add_argument('--json', dest='json_path', help='also write the results to this file as JSON')
+    args = parser.parse_args(argv)
+
+    mix = parse_mix(args.mix)
+    levels = [int(level) for level in args.concurrency.split(',')]
+    requests = build_requests(mix, args.requests, args.seed)
+
+    server = None if args.url else start_server(args.port, args.workers)
+    base_url = args.url or 'http://127.0.0.1:{}'.format(args.port)
+
+    try:
+        pids = worker_pids(server)
+        reports = []
+        for concurrency in levels:
+            level = run_level(base_url.rstrip('/') + '/pack', requests, concurrency, args.timeout, pids)
+            print_report(level)
+            reports.append(level)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump(reports, f, indent=2)
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,9 +1,50 @@
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
+import logging
+import os
+import tempfile
+import time
+from typing import Iterator, Literal, Optional
 
-from utils import combine_svg, generate_sheet, perform_pack
+from fastapi import FastAPI, Header, HTTPException, Response
+from fastapi.responses import FileResponse, StreamingResponse
+from pydantic import BaseModel, Field
+
+from capture import CaptureBuffer
+from coalesce import Coalescer, IdempotencyConflict, request_key
+from library import UNKNOWN_SHAPE, ShapeLibrary, is_reference
+from preview import preview_pack
+from results import ResultStore, etag_matches, parse_range
+from serialize import iter_json_sheets, iter_lean_svg, minimum_precision
+from utils import combine_svg, generate_sheet, perform_pack, sort_shapes
 
 app = FastAPI()
+logger = logging.getLogger(__name__)
+
+# packed sheets are written here when a request sets `store`
+results = ResultStore(
+    directory=os.environ.get('PACKAIDE_RESULTS_DIR', os.path.join(tempfile.gettempdir(), 'packaide-results')),
+    ttl=float(os.environ.get('PACKAIDE_RESULTS_TTL', 3600)),
+)
+
+# shapes registered with `/shapes`, which requests may reference by id
+library = ShapeLibrary(
+    directory=os.environ.get('PACKAIDE_LIBRARY_DIR', os.path.join(tempfile.gettempdir(), 'packaide-library')),
+    capacity=int(os.environ.get('PACKAIDE_LIBRARY_CAPACITY', 1024)),
+    disk_capacity=int(os.environ.get('PACKAIDE_LIBRARY_DISK_CAPACITY', 256 * 1024 * 1024)),
+)
+
+# identical `/pack` requests which arrive while one is running attach to it
+coalescer = Coalescer()
+
+# requests slower than this many seconds are captured for offline replay. Disabled when not set.
+CAPTURE_THRESHOLD = float(os.environ['PACKAIDE_CAPTURE_THRESHOLD']) if 'PACKAIDE_CAPTURE_THRESHOLD' in os.environ \
+    else None
+captures = CaptureBuffer(
+    directory=os.environ.get('PACKAIDE_CAPTURE_DIR', os.path.join(tempfile.gettempdir(), 'packaide-captures')),
+    capacity=int(os.environ.get('PACKAIDE_CAPTURE_CAPACITY', 100)),
+) if CAPTURE_THRESHOLD is not None else None
+
+# maximum number of sheets returned by a single page of `/results/{result_id}/sheets`
+MAX_PAGE_SIZE = 10
 
 
 class NestingRequest(BaseModel):
@@ -11,6 +52,21 @@ class NestingRequest(BaseModel):
 
     Each field is required. The `tolerance`, `offset`, and `rotations` fields *must* be passed
     from the client.
+
+    Each entry of `shapes` is either an SVG string, or the id of a shape registered with `/shapes`.
+
+    When `progressive` is set, the number of sheets is discovered with simplified shapes at a coarser tolerance
+    before a final pack at the requested `tolerance`.
+
+    The optional `sort` field reorders shapes largest first before packing. Shapes may be ordered by `area`,
+    longest bounding box side (`bbox`), or convex hull area (`hull`). Groups are flattened, so every leaf shape is
+    sorted on its own. When omitted, submission order is kept.
+
+    When `store` is set, packed sheets are written to the disk-backed result store and only a manifest is returned.
+    Sheets are then fetched individually from `/results/{id}/sheets/{n}`, or a page at a time.
+
+    When `precision` is set, sheets are rewritten compactly with coordinates rounded to that many decimal places, and
+    the response is streamed. The precision is raised if needed to keep geometry within `tolerance`.
     """
     height: float
     width: float
@@ -18,25 +74,272 @@ class NestingRequest(BaseModel):
     tolerance: float
     offset: float
     rotations: int
+    sort: Optional[Literal['area', 'bbox', 'hull']] = None
+    store: bool = False
+    precision: Optional[int] = Field(None, ge=0, le=15)
+    progressive: bool = False
 
+    def output_precision(self) -> int:
+        """ The decimal places sheets are written with, never fewer than `tolerance` allows. """
+        return max(self.precision, minimum_precision(self.tolerance))
+
+
+class ShapeRequest(BaseModel):
+    """ A shape to register in the shape library. """
+    svg: str
+
+
+def _manifest_response(manifest: dict) -> dict:
+    """ Add the URL of each sheet to a result manifest. """
+    result_id = manifest['id']
+    sheets = [dict(entry, url='/results/{}/sheets/{}'.format(result_id, entry['index']))
+              for entry in manifest['sheets']]
+    return dict(manifest, sheets=sheets)
 
-@app.post('/pack')
-def pack(request: NestingRequest):
-    # create a template sheet
-    sheet = generate_sheet(width=request.width, height=request.height)
 
-    # combine all shapes into one SVG
-    shapes = combine_svg(request.shapes)
+def _streams(request: NestingRequest) -> bool:
+    """ Whether the response to a request is serialized while it is streamed, rather than by `_pack`. """
+    return request.precision is not None and not request.store
 
-    # perform the packing operation
+
+def _capture(request: NestingRequest, timings: dict, stats: dict, error: Optional[str]) -> None:
+    """ Keep a copy of a slow request, successful or not, so it can be replayed as a benchmark. """
+    timings['total'] = sum(value for step, value in timings.items() if step != 'total')
+    if captures is None or timings['total'] <= CAPTURE_THRESHOLD:
+        return
+
+    captured = request.model_dump()
     try:
+        captured['shapes'] = library.expand(captured['shapes'])
+    except ValueError:
+        # an unknown shape id is what failed the request; capture the shapes which are known
+        captured['shapes'] = [shape for shape in captured['shapes'] if not is_reference(shape)]
+
+    # capturing is only diagnostics, and must never change the response
+    try:
+        captures.save(captured, timings, stats.get('iterations'), error=error)
+    except OSError as e:
+        logger.warning("Failed to capture slow request: %s", e)
+
+
+def _pack(request: NestingRequest, timings: dict, stats: dict) -> tuple[list[str] | dict, Optional[list[int]]]:
+    """ Run the packing operation for a request, recording the time taken by each step in `timings`.
+
+    Slow requests are captured once they finish, including those which fail. Streamed responses are captured by
+    `_timed_stream` instead, once their body has been serialized.
+
+    Returns:
+        The packed sheets (or the result manifest when `store` is set), and the shape order used when `sort` is set.
+    """
+    step, start = 'prepare', time.perf_counter()
+    error = None
+
+    try:
+        # create a template sheet
+        sheet = generate_sheet(width=request.width, height=request.height)
+
+        # combine all shapes into one SVG
+        shapes = combine_svg(request.shapes, library=library)
+
+        # order shapes before handing them to packaide, recording the order that was used
+        order = None
+        if request.sort is not None:
+            shapes, order = sort_shapes(shapes, request.sort)
+
+        timings['prepare'] = time.perf_counter() - start
+        step, start = 'pack', time.perf_counter()
+
+        # perform the packing operation
         packed_sheets: list[str] = perform_pack(shapes, sheet,
                                                 tolerance=request.tolerance,
                                                 offset=request.offset,
-                                                rotations=request.rotations)
+                                                rotations=request.rotations,
+                                                stats=stats,
+                                                progressive=request.progressive)
+
+        timings['pack'] = time.perf_counter() - start
+        step, start = 'store', time.perf_counter()
+
+        result = packed_sheets
+        if request.store:
+            if request.precision is not None:
+                precision = request.output_precision()
+                packed_sheets = (''.join(iter_lean_svg(sheet, precision)) for sheet in packed_sheets)
+            result = _manifest_response(results.save(packed_sheets))
+
+        timings['store'] = time.perf_counter() - start
+        return result, order
+
+    except Exception as e:
+        timings[step] = time.perf_counter() - start
+        error = str(e) or type(e).__name__
+        raise
+
+    finally:
+        if error is not None or not _streams(request):
+            _capture(request, timings, stats, error)
+
+
+def _timed_stream(fragments: Iterator[str], request: NestingRequest, timings: dict, stats: dict) -> Iterator[str]:
+    """ Yield a streamed response body, recording the time spent serializing it and capturing slow requests.
+
+    Only the time spent producing fragments is counted, not the time spent waiting for the client to read them.
+    """
+    elapsed = 0.0
+    error = None
+    try:
+        while True:
+            start = time.perf_counter()
+            try:
+                fragment = next(fragments)
+            except StopIteration:
+                break
+            finally:
+                elapsed += time.perf_counter() - start
+            yield fragment
+
+    except Exception as e:
+        error = str(e) or type(e).__name__
+        raise
 
-        return packed_sheets
+    finally:
+        timings['serialize'] = elapsed
+        _capture(request, timings, stats, error)
+
+
+@app.post('/pack')
+def pack(request: NestingRequest, response: Response,
+         idempotency_key: Optional[str] = Header(None)):
+    # identical requests which are in flight share a single computation
+    key = request_key(request.model_dump())
+    timings = {}
+    stats = {}
+
+    try:
+        result, shared = coalescer.run(key, lambda: _pack(request, timings, stats), idempotency_key=idempotency_key)
+
+    # a reused idempotency key must carry the same body
+    except IdempotencyConflict as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+    # return status code 400 if an error occurs
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    packed, order = result
+    headers = {}
+    if order is not None:
+        headers['X-Shape-Order'] = ','.join(str(i) for i in order)
+    if shared:
+        headers['X-Coalesced'] = 'true'
+
+    # stream compact sheets rather than building the whole response at once
+    if _streams(request):
+        body = iter_json_sheets(packed, request.output_precision())
+        if not shared:
+            # the request which computed the result records its timings
+            body = _timed_stream(body, request, timings, stats)
+        return StreamingResponse(body, media_type='application/json', headers=headers)
+
+    response.headers.update(headers)
+    return packed
+
+
+@app.post('/pack/preview')
+def pack_preview(request: NestingRequest):
+    """ Quickly estimate the sheet count, utilization, and a rough layout without performing a full nest.
+
+    Each part is approximated by its bounding box. Placements refer to parts in submission order, with groups
+    flattened into their shapes. The `sort`, `store`, and `precision` fields are ignored.
+    """
+    sheet = generate_sheet(width=request.width, height=request.height)
+
+    try:
+        shapes = combine_svg(request.shapes, library=library)
+        return preview_pack(shapes, sheet, offset=request.offset, rotations=request.rotations)
 
     # return status code 400 if an error occurs
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.post('/shapes')
+def register_shape(request: ShapeRequest):
+    """ Register a shape, returning its id along with its measured geometry. """
+    try:
+        return library.register(request.svg).describe()
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.get('/shapes/{shape_id}')
+def get_shape(shape_id: str):
+    shape = library.get(shape_id)
+    if shape is None:
+        raise HTTPException(status_code=404, detail=UNKNOWN_SHAPE.format(shape_id))
+    return dict(shape.describe(), svg=shape.svg)
+
+
+@app.get('/results/{result_id}')
+def get_result(result_id: str):
+    try:
+        return _manifest_response(results.manifest(result_id))
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=e.args[0])
+
+
+@app.get('/results/{result_id}/sheets')
+def get_sheets(result_id: str, offset: int = 0, limit: int = MAX_PAGE_SIZE):
+    """ Return a page of sheets from a stored result. """
+    if offset < 0 or not 0 < limit <= MAX_PAGE_SIZE:
+        raise HTTPException(status_code=400,
+                            detail="Invalid page, limit must be between 1 and {}".format(MAX_PAGE_SIZE))
+
+    try:
+        manifest = results.manifest(result_id)
+        indices = range(offset, min(offset + limit, manifest['sheet_count']))
+        sheets = [results.read_sheet(result_id, index) for index in indices]
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=e.args[0])
+
+    next_offset = offset + len(sheets)
+    return {
+        'id': result_id,
+        'offset': offset,
+        'total': manifest['sheet_count'],
+        'next': next_offset if next_offset < manifest['sheet_count'] else None,
+        'sheets': sheets,
+    }
+
+
+@app.get('/results/{result_id}/sheets/{index}')
+def get_sheet(result_id: str, index: int,
+              range_header: Optional[str] = Header(None, alias='Range'),
+              if_none_match: Optional[str] = Header(None)):
+    """ Return a single sheet from a stored result. Supports conditional requests with ETags and byte ranges. """
+    try:
+        path, entry = results.sheet(result_id, index)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=e.args[0])
+
+    headers = {'ETag': entry['etag'], 'Accept-Ranges': 'bytes'}
+
+    if if_none_match is not None and etag_matches(if_none_match, entry['etag']):
+        return Response(status_code=304, headers=headers)
+
+    if range_header is not None:
+        size = entry['size']
+        try:
+            byte_range = parse_range(range_header, size)
+        except ValueError as e:
+            raise HTTPException(status_code=416, detail=str(e), headers={'Content-Range': 'bytes */{}'.format(size)})
+
+        if byte_range is not None:
+            start, end = byte_range
+            with open(path, 'rb') as f:
+                f.seek(start)
+                content = f.read(end - start + 1)
+            headers['Content-Range'] = 'bytes {}-{}/{}'.format(start, end, size)
+            return Response(content=content, status_code=206, media_type='image/svg+xml', headers=headers)
+
+    return FileResponse(path, media_type='image/svg+xml', headers=headers)
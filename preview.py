@@ -0,0 +1,73 @@
+import xml.etree.ElementTree as et
+
+from geometry import apply, bounding_box, element_polygons, iter_shapes, polygon_area
+from rectpack import place_rectangles, sheet_size
+from errors import NO_SHAPE_FITS, ONE_SHAPE_TOO_BIG
+
+
+def preview_pack(shapes: str, sheet: str, offset: float, rotations: int) -> dict:
+    """ Estimate the result of packing without calling `packaide`.
+
+    Each part is replaced by its bounding box, and the boxes are placed largest first with the rectangle packer.
+    Since parts can nest closer than their bounding boxes, the estimated sheet count is an upper bound in most cases.
+
+    Returns:
+        A dictionary with the estimated `sheet_count`, the estimated `utilization` (total part area over total sheet
+        area), and the bounding box `placements` of each part, flagged as `approximate`.
+
+    Raises:
+        `ValueError` when:
+            - Sheet size is too small to fit any shape
+            - One shape is too large to fit onto sheet
+
+    Example:
+        >>> _shapes = '<svg><rect width="60" height="60" /><rect width="60" height="60" /></svg>'
+        >>> preview_pack(_shapes, '<svg viewBox="0 0 100 100"></svg>', offset=0, rotations=4)['sheet_count']
+        2
+    """
+    width, height = sheet_size(et.fromstring(sheet))
+
+    boxes = []
+    area = 0.0
+    for child in et.fromstring(shapes):
+        for element, matrix in iter_shapes(child):
+            polygons = [[apply(matrix, point) for point in polygon] for polygon in element_polygons(element)]
+            boxes.append(bounding_box([point for polygon in polygons for point in polygon]))
+            area += sum(polygon_area(polygon) for polygon in polygons)
+
+    # placing the largest boxes first gives a tighter estimate
+    sizes = [(max_x - min_x, max_y - min_y) for min_x, min_y, max_x, max_y in boxes]
+    order = sorted(range(len(sizes)), key=lambda i: sizes[i][0] * sizes[i][1], reverse=True)
+
+    placements, failed = place_rectangles([sizes[i] for i in order], width, height,
+                                          offset=offset, allow_rotation=rotations > 0 and rotations % 4 == 0)
+    if sizes and len(failed) == len(sizes):
+        raise ValueError(NO_SHAPE_FITS)
+    elif failed:
+        raise ValueError(ONE_SHAPE_TOO_BIG)
+
+    sheet_count = max((placement.sheet for placement in placements), default=-1) + 1
+
+    results = []
+    for placement in placements:
+        index = order[placement.index]
+        part_width, part_height = sizes[index]
+        if placement.rotated:
+            part_width, part_height = part_height, part_width
+        results.append({
+            'index': index,
+            'sheet': placement.sheet,
+            'x': placement.x,
+            'y': placement.y,
+            'width': part_width,
+            'height': part_height,
+            'rotated': placement.rotated,
+        })
+    results.sort(key=lambda placement: placement['index'])
+
+    return {
+        'approximate': True,
+        'sheet_count': sheet_count,
+        'utilization': area / (sheet_count * width * height) if sheet_count else 0.0,
+        'placements': results,
+    }
@@ -0,0 +1,235 @@
+import copy
+import xml.etree.ElementTree as et
+from typing import NamedTuple, Optional
+
+from geometry import Matrix, apply, bounding_box, element_polygons, iter_shapes, local_name, multiply, polygon_area
+from errors import NO_SHAPE_FITS, ONE_SHAPE_TOO_BIG
+
+SVG_NAMESPACE = 'http://www.w3.org/2000/svg'
+
+# relative tolerance used when checking that an outline is an axis-aligned rectangle
+_EPSILON = 1e-9
+
+
+class Rectangle(NamedTuple):
+    """ An axis-aligned rectangular part, and the transform which places its element in the combined SVG. """
+    element: et.Element
+    matrix: Matrix
+    min_x: float
+    min_y: float
+    width: float
+    height: float
+
+
+class Placement(NamedTuple):
+    """ The position of a part on a sheet. `x` and `y` are the top left corner of the (possibly rotated) part. """
+    index: int
+    sheet: int
+    x: float
+    y: float
+    rotated: bool
+
+
+def _close(a: float, b: float, scale: float) -> bool:
+    return abs(a - b) <= _EPSILON * max(1.0, scale)
+
+
+def _as_rectangle(element: et.Element, matrix: Matrix) -> Optional[Rectangle]:
+    """ Return the part if the element is an axis-aligned rectangle once transformed, otherwise `None`. """
+    name = local_name(element)
+    if name not in ('rect', 'path', 'polygon', 'polyline'):
+        return None
+    if name == 'rect' and any(element.attrib.get(key, '0').strip() not in ('', '0') for key in ('rx', 'ry')):
+        # rounded corners
+        return None
+
+    polygons = element_polygons(element)
+    if len(polygons) != 1:
+        return None
+    points = [apply(matrix, point) for point in polygons[0]]
+
+    min_x, min_y, max_x, max_y = bounding_box(points)
+    width, height = max_x - min_x, max_y - min_y
+    scale = max(width, height, abs(min_x), abs(min_y))
+    if width <= 0 or height <= 0:
+        return None
+
+    # every vertex must lie on a corner of the bounding box, and the outline must cover all of it
+    for x, y in points:
+        if not (_close(x, min_x, scale) or _close(x, max_x, scale)):
+            return None
+        if not (_close(y, min_y, scale) or _close(y, max_y, scale)):
+            return None
+    if not _close(polygon_area(points), width * height, scale * scale):
+        return None
+
+    return Rectangle(element, matrix, min_x, min_y, width, height)
+
+
+def find_rectangles(shapes: str) -> Optional[list[Rectangle]]:
+    """ Return every part of a combined SVG if all of them are axis-aligned rectangles, otherwise `None`.
+
+    Rectangles may be `<rect>` elements without rounded corners, or paths and polygons with an axis-aligned
+    rectangular outline. Transforms, including those of parent groups, are taken into account.
+
+    Example:
+        >>> len(find_rectangles('<svg><rect width="1" height="2" /><path d="M0 0H5V5H0Z" /></svg>'))
+        2
+        >>> find_rectangles('<svg><rect width="1" height="2" /><circle r="5" /></svg>') is None
+        True
+    """
+    root = et.fromstring(shapes)
+
+    parts = []
+    for child in root:
+        for element, matrix in iter_shapes(child):
+            part = _as_rectangle(element, matrix)
+            if part is None:
+                return None
+            parts.append(part)
+
+    return parts or None
+
+
+class _Bin:
+    """ A single sheet filled using the MaxRects algorithm with the best short side fit heuristic. """
+
+    def __init__(self, width: float, height: float):
+        self.free: list[tuple[float, float, float, float]] = [(0.0, 0.0, width, height)]
+
+    def find(self, width: float, height: float, allow_rotation: bool) -> Optional[tuple[float, float, float, bool]]:
+        """ Return the score, position, and rotation of the best fit for a part, or `None` if it does not fit. """
+        best = None
+        orientations = [(width, height, False)]
+        if allow_rotation and width != height:
+            orientations.append((height, width, True))
+
+        for x, y, free_width, free_height in self.free:
+            for w, h, rotated in orientations:
+                if w <= free_width and h <= free_height:
+                    score = min(free_width - w, free_height - h)
+                    if best is None or score < best[0]:
+                        best = (score, x, y, rotated)
+        return best
+
+    def place(self, x: float, y: float, width: float, height: float) -> None:
+        """ Split every free rectangle which overlaps the placed part, then prune contained free rectangles. """
+        split = []
+        for fx, fy, fw, fh in self.free:
+            if x >= fx + fw or x + width <= fx or y >= fy + fh or y + height <= fy:
+                split.append((fx, fy, fw, fh))
+                continue
+            if x > fx:
+                split.append((fx, fy, x - fx, fh))
+            if x + width < fx + fw:
+                split.append((x + width, fy, fx + fw - x - width, fh))
+            if y > fy:
+                split.append((fx, fy, fw, y - fy))
+            if y + height < fy + fh:
+                split.append((fx, y + height, fw, fy + fh - y - height))
+
+        self.free = [a for i, a in enumerate(split)
+                     if not any(i != j and _contains(b, a) and (b != a or j < i) for j, b in enumerate(split))]
+
+
+def _contains(outer: tuple[float, float, float, float], inner: tuple[float, float, float, float]) -> bool:
+    return outer[0] <= inner[0] and outer[1] <= inner[1] and \
+        inner[0] + inner[2] <= outer[0] + outer[2] and inner[1] + inner[3] <= outer[1] + outer[3]
+
+
+def place_rectangles(sizes: list[tuple[float, float]], width: float, height: float,
+                     offset: float, allow_rotation: bool) -> tuple[list[Placement], list[int]]:
+    """ Place rectangles onto as few sheets as needed, in the order given.
+
+    Each part is placed on the first open sheet it fits on, at the position which leaves the shortest leftover side.
+    A new sheet is opened when it does not fit on any. Parts are kept at least `offset` apart from each other.
+
+    Returns:
+        The placement of every part which fits, and the indices of parts too large for an empty sheet.
+    """
+    bins: list[_Bin] = []
+    placements = []
+    failed = []
+
+    for index, (part_width, part_height) in enumerate(sizes):
+        # reserving `offset` to the right and below each part keeps neighbouring parts apart
+        w, h = part_width + offset, part_height + offset
+
+        for sheet, candidate in enumerate(bins):
+            fit = candidate.find(w, h, allow_rotation)
+            if fit is not None:
+                break
+        else:
+            candidate = _Bin(width + offset, height + offset)
+            fit = candidate.find(w, h, allow_rotation)
+            if fit is None:
+                failed.append(index)
+                continue
+            bins.append(candidate)
+            sheet = len(bins) - 1
+
+        _, x, y, rotated = fit
+        candidate.place(x, y, h if rotated else w, w if rotated else h)
+        placements.append(Placement(index, sheet, x, y, rotated))
+
+    return placements, failed
+
+
+def sheet_size(sheet: et.Element) -> tuple[float, float]:
+    """ Return the width and height of a sheet from its viewBox. """
+    _, _, width, height = (float(value) for value in sheet.attrib['viewBox'].replace(',', ' ').split())
+    return width, height
+
+
+def _strip_namespace(element: et.Element) -> None:
+    """ Remove the SVG namespace from an element and its children, so it matches the un-namespaced output sheet. """
+    prefix = '{' + SVG_NAMESPACE + '}'
+    for node in element.iter():
+        if isinstance(node.tag, str) and node.tag.startswith(prefix):
+            node.tag = node.tag[len(prefix):]
+
+
+def _format_matrix(matrix: Matrix) -> str:
+    return 'matrix({})'.format(' '.join(repr(value) for value in matrix))
+
+
+def pack_rectangles(parts: list[Rectangle], sheet: str, offset: float, rotations: int) -> list[str]:
+    """ Pack axis-aligned rectangles without `packaide`, returning sheets in the same format as `perform_pack`.
+
+    Parts may be rotated by 90 degrees when `rotations` is a multiple of 4, matching the orientations `packaide`
+    would try. Each placed element keeps its attributes, and its transform is replaced with a single matrix which
+    moves it into position.
+
+    Raises:
+        `ValueError` when:
+            - Sheet size is too small to fit any shape
+            - One shape is too large to fit onto sheet
+    """
+    sheet_root = et.fromstring(sheet)
+    width, height = sheet_size(sheet_root)
+
+    placements, failed = place_rectangles([(part.width, part.height) for part in parts], width, height,
+                                          offset=offset, allow_rotation=rotations > 0 and rotations % 4 == 0)
+    if len(failed) == len(parts):
+        raise ValueError(NO_SHAPE_FITS)
+    elif failed:
+        raise ValueError(ONE_SHAPE_TOO_BIG)
+
+    sheet_count = max(placement.sheet for placement in placements) + 1
+    outputs = [et.Element('svg', dict(sheet_root.attrib, xmlns=SVG_NAMESPACE)) for _ in range(sheet_count)]
+
+    for placement in placements:
+        part = parts[placement.index]
+        if placement.rotated:
+            # rotate by 90 degrees clockwise, then move the top left corner of the rotated part into place
+            position = (0.0, 1.0, -1.0, 0.0, placement.x + part.min_y + part.height, placement.y - part.min_x)
+        else:
+            position = (1.0, 0.0, 0.0, 1.0, placement.x - part.min_x, placement.y - part.min_y)
+
+        element = copy.deepcopy(part.element)
+        element.tail = None
+        _strip_namespace(element)
+        element.attrib['transform'] = _format_matrix(multiply(position, part.matrix))
+        outputs[placement.sheet].append(element)
+
+    return [et.tostring(output).decode('utf8') for output in outputs]
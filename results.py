@@ -0,0 +1,195 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from typing import Iterable, Optional
+
+RESULT_NOT_FOUND = "Result not found or expired"
+SHEET_NOT_FOUND = "Sheet not found"
+RANGE_NOT_SATISFIABLE = "Requested range not satisfiable"
+
+_MANIFEST = 'manifest.json'
+
+
+def parse_range(header: str, size: int) -> Optional[tuple[int, int]]:
+    """ Parse a single `Range` header into inclusive `(start, end)` byte offsets.
+
+    `None` is returned when the header should be ignored and the whole file returned, such as for multiple ranges,
+    units other than bytes, or an invalid range which ends before it starts.
+
+    Raises:
+        `ValueError` when the range lies outside the file
+
+    Example:
+        >>> parse_range('bytes=0-9', 100)
+        (0, 9)
+        >>> parse_range('bytes=-10', 100)
+        (90, 99)
+    """
+    unit, _, spec = header.partition('=')
+    if unit.strip() != 'bytes' or ',' in spec:
+        return None
+
+    first, _, last = spec.strip().partition('-')
+    try:
+        if first:
+            start = int(first)
+            end = int(last) if last else size - 1
+            if last and end < start:
+                # a range which ends before it starts is invalid, and is ignored
+                return None
+        else:
+            # suffix range requesting the final bytes of the file
+            start = max(0, size - int(last))
+            end = size - 1
+    except ValueError:
+        return None
+
+    if start >= size:
+        raise ValueError(RANGE_NOT_SATISFIABLE)
+
+    return start, min(end, size - 1)
+
+
+def etag_matches(header: str, etag: str) -> bool:
+    """ Return whether an `If-None-Match` header matches an ETag.
+
+    Tags are compared weakly, as the header requires, so `W/"abc"` matches `"abc"`. `*` matches any ETag.
+
+    Example:
+        >>> etag_matches('W/"abc", "def"', '"abc"'), etag_matches('*', '"abc"'), etag_matches('"abc"', '"def"')
+        (True, True, False)
+    """
+    for tag in header.split(','):
+        tag = tag.strip()
+        if tag == '*' or tag.removeprefix('W/') == etag.removeprefix('W/'):
+            return True
+    return False
+
+
+class ResultStore:
+    """ Disk-backed storage for packed sheets.
+
+    Each result is a directory holding one SVG file per sheet along with a JSON manifest. Results expire `ttl`
+    seconds after they are saved. Expired results are evicted when they are requested, and the whole store is
+    scanned for them when a new result is saved, at most once every `eviction_interval` seconds.
+
+    Parameters:
+        directory (str): Where results are written. Created if it does not exist.
+        ttl (float): Number of seconds a result is kept for.
+        eviction_interval (float): Minimum number of seconds between scans for expired results.
+    """
+
+    def __init__(self, directory: str, ttl: float, eviction_interval: float = 60.0):
+        self.directory = directory
+        self.ttl = ttl
+        self.eviction_interval = eviction_interval
+        self._last_eviction = None
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, result_id: str) -> str:
+        # ids are generated by `save`; reject anything which could escape the store directory
+        if not result_id.isalnum():
+            raise KeyError(RESULT_NOT_FOUND)
+        return os.path.join(self.directory, result_id)
+
+    def save(self, sheets: Iterable[str]) -> dict:
+        """ Write each sheet to disk and return the manifest of the new result.
+
+        Sheets are written one at a time, so a generator which serializes each sheet lazily only holds one
+        serialized sheet at a time. The result only becomes visible once every sheet has been written.
+        """
+        # scanning every result is linear in the size of the store, so it is not repeated on every save
+        now = time.monotonic()
+        with self._lock:
+            due = self._last_eviction is None or now - self._last_eviction >= self.eviction_interval
+            if due:
+                self._last_eviction = now
+        if due:
+            self.evict_expired()
+
+        result_id = uuid.uuid4().hex
+        staging = tempfile.mkdtemp(prefix='.staging-', dir=self.directory)
+
+        entries = []
+        for index, sheet in enumerate(sheets):
+            data = sheet.encode('utf8')
+            with open(os.path.join(staging, '{}.svg'.format(index)), 'wb') as f:
+                f.write(data)
+            entries.append({
+                'index': index,
+                'size': len(data),
+                'etag': '"{}"'.format(hashlib.sha256(data).hexdigest()),
+            })
+
+        created = time.time()
+        manifest = {
+            'id': result_id,
+            'sheet_count': len(entries),
+            'created': created,
+            'expires': created + self.ttl,
+            'sheets': entries,
+        }
+        with open(os.path.join(staging, _MANIFEST), 'w') as f:
+            json.dump(manifest, f)
+
+        os.rename(staging, self._path(result_id))
+        return manifest
+
+    def manifest(self, result_id: str) -> dict:
+        """ Return the manifest of a stored result.
+
+        Raises:
+            `KeyError` when the result does not exist or has expired
+        """
+        path = self._path(result_id)
+        try:
+            with open(os.path.join(path, _MANIFEST)) as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            raise KeyError(RESULT_NOT_FOUND)
+
+        if manifest['expires'] <= time.time():
+            shutil.rmtree(path, ignore_errors=True)
+            raise KeyError(RESULT_NOT_FOUND)
+
+        return manifest
+
+    def sheet(self, result_id: str, index: int) -> tuple[str, dict]:
+        """ Return the file path and manifest entry of a single sheet.
+
+        Raises:
+            `KeyError` when the result or sheet does not exist
+        """
+        manifest = self.manifest(result_id)
+        if not 0 <= index < manifest['sheet_count']:
+            raise KeyError(SHEET_NOT_FOUND)
+
+        return os.path.join(self._path(result_id), '{}.svg'.format(index)), manifest['sheets'][index]
+
+    def read_sheet(self, result_id: str, index: int) -> str:
+        """ Read a single sheet into memory. """
+        path, _ = self.sheet(result_id, index)
+        with open(path, encoding='utf8') as f:
+            return f.read()
+
+    def evict_expired(self) -> None:
+        """ Delete every expired result, along with staging directories abandoned by interrupted saves. """
+        now = time.time()
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            try:
+                if name.startswith('.staging-'):
+                    expired = os.path.getmtime(path) + self.ttl <= now
+                else:
+                    with open(os.path.join(path, _MANIFEST)) as f:
+                        expired = json.load(f)['expires'] <= now
+            except (OSError, ValueError, KeyError):
+                continue
+            if expired:
+                shutil.rmtree(path, ignore_errors=True)
@@ -0,0 +1,324 @@
+import json
+import math
+import re
+import xml.etree.ElementTree as et
+from typing import Iterable, Iterator
+from xml.sax.saxutils import escape, quoteattr
+
+from geometry import IDENTITY, Matrix, local_name, multiply, parse_transform
+
+SVG_NAMESPACE = 'http://www.w3.org/2000/svg'
+
+# well known prefixes for namespaces which appear in sheets exported from editors
+_PREFIXES = {
+    'http://www.w3.org/1999/xlink': 'xlink',
+    'http://www.inkscape.org/namespaces/inkscape': 'inkscape',
+    'http://sodipodi.sourceforge.net/DTD/sodipodi-0.dtd': 'sodipodi',
+}
+
+# attributes which only hold numbers, and are rounded to the output precision
+_NUMERIC_ATTRIBUTES = {'x', 'y', 'width', 'height', 'cx', 'cy', 'r', 'rx', 'ry', 'x1', 'y1', 'x2', 'y2',
+                       'points', 'viewBox'}
+
+# additional digits kept for the linear part of a transform, since its error is multiplied by the coordinates
+_LINEAR_EXTRA_DIGITS = 6
+
+_NUMBER = re.compile(r'[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?')
+_SEPARATOR = re.compile(r'[\s,]*')
+_PATH_ARGS = {'M': 2, 'L': 2, 'H': 1, 'V': 1, 'C': 6, 'S': 4, 'Q': 4, 'T': 2, 'A': 7, 'Z': 0}
+
+
+def minimum_precision(tolerance: float) -> int:
+    """ Return the fewest decimal places which keep rounded geometry within `tolerance` at unit scale.
+
+    A rounded coordinate is off by at most half a unit in the last place on each axis, and the coordinate, a radius,
+    and the translation of its transform may all be rounded, so the worst case error is under `2 * 10 ** -precision`.
+    Elements drawn at a larger scale are given more digits by `iter_lean_svg`.
+
+    Example:
+        >>> minimum_precision(0.1)
+        2
+    """
+    if tolerance <= 0:
+        return 15
+    return max(0, math.ceil(math.log10(2 / tolerance)))
+
+
+def format_number(value: float, precision: int) -> str:
+    """ Format a number with at most `precision` decimal places and no redundant characters.
+
+    Example:
+        >>> format_number(-0.50001, 3)
+        '-.5'
+        >>> format_number(12.0, 3)
+        '12'
+    """
+    text = '{:.{}f}'.format(value, precision)
+    if '.' in text:
+        text = text.rstrip('0').rstrip('.')
+    if text in ('-0', ''):
+        return '0'
+    if text.startswith('0.'):
+        return text[1:]
+    if text.startswith('-0.'):
+        return '-' + text[2:]
+    return text
+
+
+def _round_numbers(value: str, precision: int) -> str:
+    return _NUMBER.sub(lambda match: format_number(float(match.group()), precision), value)
+
+
+def round_path(d: str, precision: int) -> str:
+    """ Round the coordinates of SVG path data.
+
+    Arc flags may be written without separators (`a5 5 0 015 5`), so path data is scanned command by command
+    rather than rounding every number found. Relative coordinates are rounded as absolute positions and written as
+    the difference from the previous rounded position, so rounding error does not accumulate along the path. Arc
+    radii and rotations are kept as written, since their error is multiplied by the size of the arc.
+
+    Example:
+        >>> round_path('M 0.123456 1 L 2.5 3.0001 z', 2)
+        'M.12 1L2.5 3z'
+        >>> round_path('m.004 0 h.004 .004', 2)
+        'm0 0h.01 0'
+    """
+    output = []
+    position = _SEPARATOR.match(d).end()
+    command = ''
+
+    # the current point and the start of the current subpath, both exactly and after rounding
+    current, rounded = (0.0, 0.0), (0.0, 0.0)
+    start, rounded_start = current, rounded
+
+    while position < len(d):
+        new_subpath = False
+        if d[position].isalpha():
+            command = d[position]
+            output.append(command)
+            position = _SEPARATOR.match(d, position + 1).end()
+            if command.upper() == 'Z':
+                current, rounded = start, rounded_start
+                continue
+            new_subpath = command.upper() == 'M'
+        elif not command or command.upper() == 'Z':
+            # malformed path data, keep the remainder as is
+            output.append(d[position:])
+            break
+
+        upper = command.upper()
+        relative = command.islower()
+        args = []
+        point, rounded_point = list(current), list(rounded)
+        for i in range(_PATH_ARGS.get(upper, 0)):
+            if upper == 'A' and i in (3, 4) and d[position:position + 1] in ('0', '1'):
+                args.append(d[position])
+                position = _SEPARATOR.match(d, position + 1).end()
+                continue
+            match = _NUMBER.match(d, position)
+            if match is None:
+                output.append(' '.join(args) + d[position:])
+                return ''.join(output)
+            position = _SEPARATOR.match(d, match.end()).end()
+
+            if upper == 'A' and i < 5:
+                args.append(match.group())
+                continue
+
+            if upper == 'A':
+                # the end point of an arc follows the radii, rotation, and flags
+                axis = i - 5
+            else:
+                axis = 1 if upper == 'V' or (upper != 'H' and i % 2) else 0
+            value = float(match.group()) + (current[axis] if relative else 0.0)
+            rounded_value = round(value, precision)
+            args.append(format_number(rounded_value - rounded[axis] if relative else rounded_value, precision))
+            point[axis], rounded_point[axis] = value, rounded_value
+
+        # the last coordinates of a segment are its end point, which the next segment starts from
+        current, rounded = tuple(point), tuple(rounded_point)
+        if new_subpath:
+            start, rounded_start = current, rounded
+
+        # numbers only need a separator when the next one does not start with a sign
+        joined = ''.join(arg if not i or arg.startswith('-') else ' ' + arg for i, arg in enumerate(args))
+        if output and not output[-1][-1:].isalpha() and joined and not joined.startswith('-'):
+            output.append(' ')
+        output.append(joined)
+
+    return ''.join(output)
+
+
+def _scale_digits(matrix: Matrix) -> int:
+    """ Return the extra decimal places needed to keep rounding error unchanged once scaled by a matrix.
+
+    The largest distance a matrix can stretch an error by is the largest singular value of its linear part.
+
+    Example:
+        >>> _scale_digits((100, 0, 0, 100, 0, 0)), _scale_digits((0.5, 0, 0, 0.5, 0, 0))
+        (2, 0)
+    """
+    a, b, c, d, _, _ = matrix
+    squares = a * a + b * b + c * c + d * d
+    determinant = a * d - b * c
+    scale = math.sqrt((squares + math.sqrt(max(0.0, squares * squares - 4 * determinant * determinant))) / 2)
+    return max(0, math.ceil(math.log10(scale))) if scale > 1 else 0
+
+
+def format_transform(matrix: Matrix, precision: int) -> str | None:
+    """ Write an affine matrix as the shortest equivalent `transform` attribute, or `None` for the identity. """
+    a, b, c, d, e, f = matrix
+    linear_precision = precision + _LINEAR_EXTRA_DIGITS
+    linear = [format_number(value, linear_precision) for value in (a, b, c, d)]
+    translation = [format_number(value, precision) for value in (e, f)]
+
+    if linear == ['1', '0', '0', '1']:
+        if translation == ['0', '0']:
+            return None
+        if translation[1] == '0':
+            return 'translate({})'.format(translation[0])
+        return 'translate({} {})'.format(*translation)
+
+    return 'matrix({})'.format(' '.join(linear + translation))
+
+
+def _chain_digits(depth: int) -> int:
+    """ Return the extra decimal places needed when a coordinate is placed by `depth` rounded transforms.
+
+    `minimum_precision` allows for one rounded transform. Every further one adds the error of its translation.
+    """
+    return max(0, math.ceil(math.log10((1 + math.sqrt(2) * (depth + 1)) / 4)))
+
+
+def _merge_transforms(element: et.Element, frames: dict[et.Element, tuple[Matrix, Matrix, int]],
+                      inherited: Matrix = IDENTITY, frame: Matrix = IDENTITY, depth: int = 0) -> None:
+    """ Collapse transform lists into a single matrix, and fold groups which only carry a transform into their child.
+
+    The merged matrix of every element is stored in `frames`, along with the combined matrix of its ancestors and
+    the number of transforms between the element and the root.
+    """
+    matrix = multiply(inherited, parse_transform(element.attrib.pop('transform', None)))
+
+    # a group with no other attributes and a single child is redundant once its transform is pushed down
+    children = list(element)
+    if local_name(element) == 'g' and not element.attrib and len(children) == 1 and \
+            local_name(children[0]) != 'svg' and not (element.text or '').strip():
+        child = children[0]
+        element.remove(child)
+        element.extend(child)
+        element.tag = child.tag
+        element.attrib.update(child.attrib)
+        element.text = child.text
+        _merge_transforms(element, frames, matrix, frame, depth)
+        return
+
+    if matrix != IDENTITY:
+        depth += 1
+    frames[element] = (frame, matrix, depth)
+    for child in children:
+        _merge_transforms(child, frames, frame=multiply(frame, matrix), depth=depth)
+
+
+class _Namespaces:
+    """ Assign prefixes to every namespace used by a sheet, so each is declared once on the root element. """
+
+    def __init__(self):
+        self.declared: dict[str, str] = {}
+
+    def name(self, qualified: str) -> str:
+        if not qualified.startswith('{'):
+            return qualified
+        uri, local = qualified[1:].split('}', 1)
+        if uri == SVG_NAMESPACE:
+            return local
+        if uri == 'http://www.w3.org/XML/1998/namespace':
+            return 'xml:' + local
+        if uri not in self.declared:
+            self.declared[uri] = _PREFIXES.get(uri, 'ns{}'.format(len(self.declared)))
+        return '{}:{}'.format(self.declared[uri], local)
+
+
+def _attributes(element: et.Element, namespaces: _Namespaces, precisions: dict[et.Element, int]) -> str:
+    precision = precisions[element]
+    parts = []
+    for key, value in element.attrib.items():
+        name = namespaces.name(key)
+        if name == 'd':
+            value = round_path(value, precision)
+        elif name in _NUMERIC_ATTRIBUTES:
+            value = _round_numbers(value, precision)
+        parts.append(' {}={}'.format(name, quoteattr(value)))
+    return ''.join(parts)
+
+
+def _iter_element(element: et.Element, namespaces: _Namespaces,
+                  precisions: dict[et.Element, int]) -> Iterator[str]:
+    name = namespaces.name(element.tag)
+    attributes = _attributes(element, namespaces, precisions)
+    text = element.text if element.text and element.text.strip() else ''
+
+    if not len(element) and not text:
+        yield '<{}{}/>'.format(name, attributes)
+    else:
+        yield '<{}{}>{}'.format(name, attributes, escape(text))
+        for child in element:
+            yield from _iter_element(child, namespaces, precisions)
+            if child.tail and child.tail.strip():
+                yield escape(child.tail)
+        yield '</{}>'.format(name)
+
+
+def iter_lean_svg(svg: str, precision: int) -> Iterator[str]:
+    """ Serialize an SVG string compactly, yielding it in fragments.
+
+    Coordinates are rounded to `precision` decimal places, plus the digits needed to keep the rounding error of
+    elements drawn at a larger scale, or placed by several transforms, equally small. Transforms are merged into a
+    single matrix per element, groups which only carry a transform are folded into their child, and whitespace
+    between elements is removed.
+    The SVG namespace becomes the default namespace and every other namespace is declared once on the root.
+
+    Example:
+        >>> ''.join(iter_lean_svg('<svg xmlns="http://www.w3.org/2000/svg"> <rect x="0.1234" /> </svg>', 2))
+        '<svg xmlns="http://www.w3.org/2000/svg"><rect x=".12"/></svg>'
+    """
+    root = et.fromstring(svg)
+    frames = {}
+    _merge_transforms(root, frames)
+
+    # rounding errors are stretched by the transforms above each element, and add up along chains of transforms
+    precision += _chain_digits(max(depth for _, _, depth in frames.values()))
+    precisions = {}
+    for element, (frame, matrix, _) in frames.items():
+        transform = format_transform(matrix, precision + _scale_digits(frame))
+        if transform is not None:
+            element.attrib['transform'] = transform
+        precisions[element] = precision + _scale_digits(multiply(frame, matrix))
+
+    # every namespace in use is assigned a prefix up front, so it can be declared on the root element
+    namespaces = _Namespaces()
+    for element in root.iter():
+        namespaces.name(element.tag)
+        for key in element.attrib:
+            namespaces.name(key)
+
+    name = namespaces.name(root.tag)
+    declarations = ' xmlns="{}"'.format(SVG_NAMESPACE)
+    for uri, prefix in namespaces.declared.items():
+        declarations += ' xmlns:{}={}'.format(prefix, quoteattr(uri))
+
+    yield '<{}{}{}>'.format(name, declarations, _attributes(root, namespaces, precisions))
+    for child in root:
+        yield from _iter_element(child, namespaces, precisions)
+    yield '</{}>'.format(name)
+
+
+def iter_json_sheets(sheets: Iterable[str], precision: int) -> Iterator[str]:
+    """ Yield a JSON array of leanly serialized sheets in fragments, without building the full document. """
+    yield '['
+    for index, sheet in enumerate(sheets):
+        yield ',"' if index else '"'
+        for fragment in iter_lean_svg(sheet, precision):
+            # escaping is done per character, so fragments may be encoded independently
+            yield json.dumps(fragment)[1:-1]
+        yield '"'
+    yield ']'
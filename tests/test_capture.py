@@ -0,0 +1,73 @@
+import os
+import tempfile
+import unittest
+from xml.etree import ElementTree
+
+from capture import CaptureBuffer, capture_files, load_capture, redact_svg
+
+
+def _generate_request():
+    return {
+        'height': 10,
+        'width': 10,
+        'shapes': ["""
+        <svg>
+          <title>Customer part</title>
+          <rect id="part-1" class="acme" width="100" height="50" style="fill:red" />
+          <text x="1" y="1">Label</text>
+        </svg>
+        """],
+        'tolerance': 0.1,
+        'offset': 1,
+        'rotations': 4,
+    }
+
+
+class TestRedaction(unittest.TestCase):
+    def test_identifying_content_removed(self):
+        """ Test that text and non-geometric attributes are removed """
+        redacted = redact_svg(_generate_request()['shapes'][0])
+
+        self.assertNotIn('Customer', redacted)
+        self.assertNotIn('Label', redacted)
+        self.assertNotIn('part-1', redacted)
+        self.assertNotIn('fill', redacted)
+
+    def test_geometry_kept(self):
+        """ Test that geometry is unchanged by redaction """
+        redacted = ElementTree.fromstring(redact_svg(_generate_request()['shapes'][0]))
+
+        self.assertEqual(1, len(redacted))
+        self.assertEqual({'width': '100', 'height': '50'}, redacted[0].attrib)
+
+
+class TestCaptureBuffer(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_save_and_load(self):
+        """ Test that a capture is redacted and stores its timings """
+        buffer = CaptureBuffer(self.directory.name, capacity=10)
+
+        path = buffer.save(_generate_request(), {'pack': 2.5}, iterations=3)
+        capture = load_capture(path)
+
+        self.assertEqual({'pack': 2.5}, capture['timings'])
+        self.assertEqual(3, capture['iterations'])
+        self.assertNotIn('Customer', capture['request']['shapes'][0])
+
+    def test_capacity(self):
+        """ Test that only the newest captures are kept """
+        buffer = CaptureBuffer(self.directory.name, capacity=3)
+
+        paths = [buffer.save(_generate_request(), {}, iterations=i) for i in range(5)]
+
+        self.assertEqual(paths[2:], capture_files(self.directory.name))
+        self.assertFalse(os.path.exists(paths[0]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from coalesce import Coalescer, IdempotencyConflict, request_key
+
+
+class TestCoalescer(unittest.TestCase):
+    def test_identical_requests_share_result(self):
+        """ Test that concurrent callers with the same key run the computation once """
+        coalescer = Coalescer()
+        started = threading.Event()
+        release = threading.Event()
+        calls = []
+
+        def compute():
+            calls.append(1)
+            started.set()
+            release.wait()
+            return ['sheet']
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            first = executor.submit(coalescer.run, 'key', compute)
+            started.wait()
+            second = executor.submit(coalescer.run, 'key', compute)
+
+            # give the second caller time to attach before the computation finishes
+            time.sleep(0.1)
+            release.set()
+
+            self.assertEqual((['sheet'], False), first.result())
+            self.assertEqual((['sheet'], True), second.result())
+
+        self.assertEqual(1, len(calls))
+
+    def test_exceptions_are_shared(self):
+        """ Test that an exception is raised to the caller """
+        coalescer = Coalescer()
+
+        def compute():
+            raise ValueError('failed')
+
+        with self.assertRaises(ValueError):
+            coalescer.run('key', compute)
+
+    def test_completed_requests_are_recomputed(self):
+        """ Test that results are not cached once a computation finishes """
+        coalescer = Coalescer()
+        calls = []
+
+        coalescer.run('key', lambda: calls.append(1))
+        coalescer.run('key', lambda: calls.append(1))
+
+        self.assertEqual(2, len(calls))
+
+
+class TestRequestKey(unittest.TestCase):
+    def test_idempotency_key_conflict(self):
+        """ Test that an idempotency key in flight cannot be reused for a different request """
+        coalescer = Coalescer()
+        started = threading.Event()
+        release = threading.Event()
+
+        def slow():
+            started.set()
+            release.wait()
+            return 1
+
+        thread = threading.Thread(target=coalescer.run, args=('a', slow, 'client-key'))
+        thread.start()
+        started.wait()
+        try:
+            with self.assertRaises(IdempotencyConflict):
+                coalescer.run('b', lambda: 2, idempotency_key='client-key')
+        finally:
+            release.set()
+            thread.join()
+
+        # once the request finishes, the idempotency key may be used again
+        self.assertEqual((2, False), coalescer.run('b', lambda: 2, idempotency_key='client-key'))
+
+    def test_different_bodies(self):
+        """ Test that different requests produce different keys """
+        self.assertNotEqual(request_key({'width': 1}), request_key({'width': 2}))
+
+
+if __name__ == '__main__':
+    unittest.main()
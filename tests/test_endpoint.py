@@ -1,9 +1,16 @@
+import tempfile
 import unittest
+from concurrent.futures import Future
 from xml.etree import ElementTree
 
+import main
+from capture import CaptureBuffer, capture_files, load_capture
+from coalesce import request_key
+from errors import NO_SHAPE_FITS, ONE_SHAPE_TOO_BIG
 from fastapi.testclient import TestClient
-from main import app
-from utils import NO_SHAPE_FITS, ONE_SHAPE_TOO_BIG
+from library import ShapeLibrary
+from main import NestingRequest, app, coalescer
+from results import ResultStore
 
 
 class TestPackEndpoint(unittest.TestCase):
@@ -159,5 +166,297 @@ class TestPackEndpoint(unittest.TestCase):
         self.assertEqual(ONE_SHAPE_TOO_BIG, detail)
 
 
+class TestCoalescing(unittest.TestCase):
+    def setUp(self):
+        self.client = TestClient(app)
+        self.request = {
+            "height": 2,
+            "width": 2,
+            "shapes": ['<svg><rect height="100" width="100" /></svg>'],
+            "tolerance": 0.1,
+            "offset": 1,
+            "rotations": 4,
+            "store": True,
+        }
+
+        # simulate the request being in flight under an idempotency key
+        self.key = request_key(NestingRequest(**self.request).model_dump())
+        in_flight = Future()
+        in_flight.set_result(({'id': 'a', 'sheets': []}, None))
+        coalescer._in_flight[self.key] = in_flight
+        coalescer._idempotency_keys['shared-key'] = self.key
+
+    def tearDown(self):
+        del coalescer._in_flight[self.key]
+        del coalescer._idempotency_keys['shared-key']
+
+    def test_idempotency_key_with_different_body(self):
+        """ Test that a reused `Idempotency-Key` with a different body is rejected """
+        request = dict(self.request, shapes=['<svg><rect height="50" width="50" /></svg>'])
+
+        response = self.client.post("/pack", json=request, headers={'Idempotency-Key': 'shared-key'})
+
+        self.assertEqual(response.status_code, 422)
+
+    def test_identical_body_without_key(self):
+        """ Test that an identical request coalesces whether or not it carries the `Idempotency-Key` """
+        for headers in ({}, {'Idempotency-Key': 'shared-key'}):
+            response = self.client.post("/pack", json=self.request, headers=headers)
+
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual('true', response.headers['x-coalesced'])
+            self.assertEqual('a', response.json()['id'])
+
+
+class TestShapeOrder(unittest.TestCase):
+    def setUp(self):
+        self.client = TestClient(app)
+
+    def test_grouped_shapes_are_sorted(self):
+        """ Test that shapes inside a group are sorted individually, and numbered as in the preview """
+        request = {
+            "height": 100,
+            "width": 100,
+            "shapes": ['<svg><g><rect height="10" width="10" /><rect height="50" width="100" /></g>'
+                       '<rect height="30" width="30" /></svg>'],
+            "tolerance": 0.1,
+            "offset": 1,
+            "rotations": 4,
+            "sort": "area",
+        }
+
+        response = self.client.post("/pack", json=request)
+        preview = self.client.post("/pack/preview", json=request)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual('1,2,0', response.headers['x-shape-order'])
+        self.assertEqual([0, 1, 2], [placement['index'] for placement in preview.json()['placements']])
+
+
+class TestCapture(unittest.TestCase):
+    def setUp(self):
+        self.client = TestClient(app)
+        self.directory = tempfile.TemporaryDirectory()
+
+        # capture every request
+        self.original = main.captures, main.CAPTURE_THRESHOLD
+        main.captures = CaptureBuffer(self.directory.name, capacity=10)
+        main.CAPTURE_THRESHOLD = -1.0
+
+        self.request = {
+            "height": 100,
+            "width": 100,
+            "shapes": ['<svg><rect height="10" width="20" /></svg>'],
+            "tolerance": 0.1,
+            "offset": 1,
+            "rotations": 4,
+        }
+
+    def tearDown(self):
+        main.captures, main.CAPTURE_THRESHOLD = self.original
+        self.directory.cleanup()
+
+    def _captures(self):
+        return [load_capture(path) for path in capture_files(self.directory.name)]
+
+    def test_failed_request(self):
+        """ Test that a request which fails is captured along with its error """
+        request = dict(self.request, shapes=['<svg><rect height="10" width="20000" /></svg>'])
+
+        response = self.client.post("/pack", json=request)
+
+        self.assertEqual(response.status_code, 400)
+        captures = self._captures()
+        self.assertEqual(1, len(captures))
+        self.assertEqual(NO_SHAPE_FITS, captures[0]['error'])
+        self.assertIn('pack', captures[0]['timings'])
+
+    def test_capture_failure(self):
+        """ Test that a capture which cannot be written does not change the response """
+        self.directory.cleanup()
+
+        request = dict(self.request, shapes=['<svg><rect height="10" width="20000" /></svg>'])
+
+        response = self.client.post("/pack", json=self.request)
+        failed = self.client.post("/pack", json=request)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(failed.status_code, 400)
+
+    def test_streamed_request(self):
+        """ Test that a streamed request is captured once its body is serialized, including the time taken """
+        response = self.client.post("/pack", json=dict(self.request, precision=2))
+
+        self.assertEqual(response.status_code, 200)
+        captures = self._captures()
+        self.assertEqual(1, len(captures))
+        timings = captures[0]['timings']
+        self.assertIsNone(captures[0]['error'])
+        self.assertIn('serialize', timings)
+        self.assertAlmostEqual(sum(value for step, value in timings.items() if step != 'total'), timings['total'])
+
+
+class TestPreviewEndpoint(unittest.TestCase):
+    def setUp(self):
+        self.client = TestClient(app)
+
+    def test_preview(self):
+        """ Test that a preview returns an approximate sheet count and placements """
+        shape = """
+        <svg>
+        <rect height="100" width="100" />
+        <circle r="50" />
+        </svg>
+        """
+
+        request_data = {
+            "height": 2,
+            "width": 2,
+            "shapes": [shape],
+            "tolerance": 0.1,
+            "offset": 1,
+            "rotations": 4,
+        }
+
+        response = self.client.post("/pack/preview", json=request_data)
+
+        self.assertEqual(response.status_code, 200)
+        preview = response.json()
+        self.assertTrue(preview['approximate'])
+        self.assertEqual(2, preview['sheet_count'])
+        self.assertEqual(2, len(preview['placements']))
+
+
+class TestShapesEndpoint(unittest.TestCase):
+    def setUp(self):
+        self.client = TestClient(app)
+        self.directory = tempfile.TemporaryDirectory()
+
+        # keep registered shapes out of the server's shape library
+        self.original = main.library
+        main.library = ShapeLibrary(self.directory.name, capacity=10, disk_capacity=1024 * 1024)
+
+    def tearDown(self):
+        main.library = self.original
+        self.directory.cleanup()
+
+    def test_register_and_reference(self):
+        """ Test that registered shapes can be referenced by id """
+        shape = """
+        <svg>
+        <rect height="100" width="100" />
+        </svg>
+        """
+
+        response = self.client.post("/shapes", json={"svg": shape})
+        self.assertEqual(response.status_code, 200)
+        registered = response.json()
+        self.assertEqual(10000, registered['area'])
+
+        request_data = {
+            "height": 2,
+            "width": 2,
+            "shapes": [registered['id'], shape],
+            "tolerance": 0.1,
+            "offset": 1,
+            "rotations": 4,
+        }
+        response = self.client.post("/pack/preview", json=request_data)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(2, len(response.json()['placements']))
+
+    def test_unknown_shape(self):
+        """ Test that unknown ids return an error """
+        response = self.client.get(f"/shapes/{'0' * 64}")
+        self.assertEqual(response.status_code, 404)
+
+        request_data = {
+            "height": 2,
+            "width": 2,
+            "shapes": ['0' * 64],
+            "tolerance": 0.1,
+            "offset": 1,
+            "rotations": 4,
+        }
+        response = self.client.post("/pack/preview", json=request_data)
+        self.assertEqual(response.status_code, 400)
+
+
+class TestResultsEndpoint(unittest.TestCase):
+    def setUp(self):
+        self.client = TestClient(app)
+        self.directory = tempfile.TemporaryDirectory()
+
+        # keep stored results out of the server's result store
+        self.original = main.results
+        main.results = ResultStore(self.directory.name, ttl=60)
+
+        self.sheets = ['<svg viewBox="0 0 10 10"><rect width="{}" height="1" /></svg>'.format(i + 1)
+                       for i in range(12)]
+        self.manifest = main.results.save(self.sheets)
+        self.result_id = self.manifest['id']
+
+    def tearDown(self):
+        main.results = self.original
+        self.directory.cleanup()
+
+    def test_manifest(self):
+        """ Test that the manifest lists a URL for each sheet """
+        response = self.client.get(f"/results/{self.result_id}")
+
+        self.assertEqual(response.status_code, 200)
+        manifest = response.json()
+        self.assertEqual(12, manifest['sheet_count'])
+        self.assertEqual(f"/results/{self.result_id}/sheets/3", manifest['sheets'][3]['url'])
+
+    def test_single_sheet(self):
+        """ Test that a single sheet is returned along with its ETag """
+        response = self.client.get(f"/results/{self.result_id}/sheets/2")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.sheets[2], response.text)
+        self.assertEqual(self.manifest['sheets'][2]['etag'], response.headers['etag'])
+
+    def test_not_modified(self):
+        """ Test that a matching `If-None-Match` header returns 304 """
+        etag = self.manifest['sheets'][0]['etag']
+
+        for header in (etag, 'W/' + etag, '*'):
+            response = self.client.get(f"/results/{self.result_id}/sheets/0", headers={'If-None-Match': header})
+
+            self.assertEqual(response.status_code, 304)
+
+    def test_invalid_range(self):
+        """ Test that a range which ends before it starts is ignored """
+        response = self.client.get(f"/results/{self.result_id}/sheets/0", headers={'Range': 'bytes=5-2'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.sheets[0], response.text)
+
+    def test_range(self):
+        """ Test that byte ranges of a sheet may be requested """
+        response = self.client.get(f"/results/{self.result_id}/sheets/0", headers={'Range': 'bytes=0-3'})
+
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual('<svg', response.text)
+        self.assertEqual(f"bytes 0-3/{len(self.sheets[0])}", response.headers['content-range'])
+
+    def test_pagination(self):
+        """ Test paging through all sheets """
+        first = self.client.get(f"/results/{self.result_id}/sheets").json()
+        second = self.client.get(f"/results/{self.result_id}/sheets", params={'offset': first['next']}).json()
+
+        self.assertEqual(self.sheets[:10], first['sheets'])
+        self.assertEqual(self.sheets[10:], second['sheets'])
+        self.assertIsNone(second['next'])
+
+    def test_missing_result(self):
+        """ Test that unknown results return 404 """
+        response = self.client.get("/results/missing/sheets/0")
+
+        self.assertEqual(response.status_code, 404)
+
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
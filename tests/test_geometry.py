@@ -0,0 +1,65 @@
+import math
+import unittest
+from xml.etree import ElementTree
+
+from geometry import bbox_max_side, convex_hull, hull_area, parse_path, parse_transform, polygon_area, shape_area
+
+
+class TestParsePath(unittest.TestCase):
+    def test_absolute_lines(self):
+        """ Test that absolute line commands produce a closed polygon """
+        polygons = parse_path('M 0 0 L 10 0 L 10 10 L 0 10 Z')
+
+        self.assertEqual([[(0, 0), (10, 0), (10, 10), (0, 10)]], polygons)
+
+    def test_relative_lines(self):
+        """ Test that relative and implicit line-to commands are resolved """
+        polygons = parse_path('m 5 5 10 0 0 10 -10 0 z')
+
+        self.assertEqual([[(5, 5), (15, 5), (15, 15), (5, 15)]], polygons)
+
+    def test_multiple_subpaths(self):
+        """ Test that each subpath is returned as a separate polygon """
+        polygons = parse_path('M 0 0 H 1 V 1 Z M 5 5 H 6 V 6 Z')
+
+        self.assertEqual(2, len(polygons))
+
+    def test_arc_circle(self):
+        """ Test that a circle drawn with two arcs has approximately the correct area """
+        polygons = parse_path('M 0 50 A 50 50 0 0 1 100 50 A 50 50 0 0 1 0 50 Z')
+
+        self.assertAlmostEqual(math.pi * 50 * 50, polygon_area(polygons[0]), delta=100)
+
+
+class TestTransform(unittest.TestCase):
+    def test_composed_transform(self):
+        """ Test that a list of transforms is composed from left to right """
+        matrix = parse_transform('translate(10 20) scale(2)')
+
+        self.assertEqual((2, 0, 0, 2, 10, 20), matrix)
+
+
+class TestMeasurements(unittest.TestCase):
+    def test_group_with_transform(self):
+        """ Test that measurements account for transforms on parent groups """
+        svg = ElementTree.fromstring('<svg><g transform="scale(2)"><rect width="10" height="5" /></g></svg>')
+
+        self.assertEqual(200, shape_area(svg))
+        self.assertEqual(20, bbox_max_side(svg))
+        self.assertEqual(200, hull_area(svg))
+
+    def test_convex_hull(self):
+        """ Test that interior points are dropped from the convex hull """
+        points = [(0, 0), (10, 0), (5, 5), (10, 10), (0, 10)]
+
+        self.assertEqual(4, len(convex_hull(points)))
+
+    def test_ellipse_area(self):
+        """ Test that ellipses are approximated closely """
+        ellipse = ElementTree.fromstring('<ellipse rx="20" ry="10" />')
+
+        self.assertAlmostEqual(math.pi * 20 * 10, shape_area(ellipse), delta=5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,111 @@
+import os
+import tempfile
+import unittest
+from xml.etree import ElementTree
+
+from library import ShapeLibrary, is_reference
+from utils import combine_svg
+
+
+def _generate_shape():
+    return """
+    <svg>
+      <rect width="100" height="50" />
+      <path d="M 0 0 L 5 0.01 L 10 0 L 10 10 L 0 10 Z" />
+    </svg>
+    """
+
+
+class TestShapeLibrary(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.library = ShapeLibrary(self.directory.name, capacity=2, disk_capacity=1024 * 1024)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_register(self):
+        """ Test that registered shapes are measured """
+        shape = self.library.register(_generate_shape())
+
+        self.assertAlmostEqual(5100, shape.area, delta=0.1)
+        self.assertEqual((0, 0, 100, 50), shape.bbox)
+        self.assertEqual(2, len(shape.elements))
+
+    def test_outline_is_simplified(self):
+        """ Test that nearly collinear vertices are removed from the outline """
+        shape = self.library.register(_generate_shape())
+
+        self.assertEqual(4, len(shape.outline[1]))
+
+    def test_same_shape_same_id(self):
+        """ Test that ids only depend on the content of the shape """
+        first = self.library.register(_generate_shape())
+        second = self.library.register(_generate_shape().replace('\n', ' '))
+
+        self.assertEqual(first.id, second.id)
+
+    def test_invalid_shape(self):
+        with self.assertRaises(ValueError):
+            self.library.register('<svg>')
+
+    def test_unknown_shape(self):
+        with self.assertRaises(ValueError):
+            self.library.resolve('0' * 64)
+
+    def test_evicted_shapes_load_from_disk(self):
+        """ Test that shapes evicted from the cache are loaded from disk """
+        first = self.library.register(_generate_shape())
+        self.library.register('<svg><rect width="1" height="1" /></svg>')
+        self.library.register('<svg><rect width="2" height="2" /></svg>')
+
+        self.assertNotIn(first.id, self.library._cache)
+        self.assertEqual(first.area, self.library.resolve(first.id).area)
+
+    def test_persisted_between_instances(self):
+        """ Test that shapes survive a restart """
+        shape = self.library.register(_generate_shape())
+
+        library = ShapeLibrary(self.directory.name, capacity=2, disk_capacity=1024 * 1024)
+
+        self.assertEqual(shape.bbox, library.resolve(shape.id).bbox)
+
+    def test_disk_capacity(self):
+        """ Test that the least recently used shapes are deleted once the disk capacity is exceeded """
+        shapes = ['<svg><rect width="{}" height="1"></rect></svg>'.format(i) for i in range(3)]
+        library = ShapeLibrary(self.directory.name, capacity=1, disk_capacity=2 * len(shapes[0]))
+
+        first = library.register(shapes[0])
+        second = library.register(shapes[1])
+        os.utime(library._path(first.id), (0, 0))
+        os.utime(library._path(second.id), (1, 1))
+
+        # using the first shape makes the second one the least recently used
+        library.resolve(first.id)
+        third = library.register(shapes[2])
+
+        self.assertIsNotNone(library.get(first.id))
+        self.assertIsNone(library.get(second.id))
+        self.assertIsNotNone(library.get(third.id))
+
+    def test_shape_larger_than_disk_capacity(self):
+        library = ShapeLibrary(self.directory.name, capacity=2, disk_capacity=10)
+
+        with self.assertRaises(ValueError):
+            library.register(_generate_shape())
+
+    def test_combine_with_references(self):
+        """ Test that ids and inline SVG may be mixed """
+        shape = self.library.register(_generate_shape())
+
+        combined = combine_svg([shape.id, _generate_shape()], library=self.library)
+
+        self.assertEqual(4, len(ElementTree.fromstring(combined)))
+
+    def test_is_reference(self):
+        self.assertTrue(is_reference('abc123'))
+        self.assertFalse(is_reference('  <svg></svg>'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,46 @@
+import unittest
+
+from loadtest import build_requests, parse_mix, percentile
+from rectpack import find_rectangles
+from utils import combine_svg
+
+
+class TestLoadTest(unittest.TestCase):
+    def test_parse_mix(self):
+        """ Test that mix weights are normalized """
+        mix = parse_mix('small=1,large=3')
+
+        self.assertEqual({'small': 0.25, 'large': 0.75}, mix)
+
+    def test_parse_unknown_kind(self):
+        """ Test that unknown request kinds are rejected """
+        with self.assertRaises(ValueError):
+            parse_mix('huge=1')
+
+    def test_percentile(self):
+        """ Test nearest-rank percentiles """
+        values = list(range(1, 101))
+
+        self.assertEqual(50, percentile(values, 50))
+        self.assertEqual(95, percentile(values, 95))
+        self.assertEqual(99, percentile(values, 99))
+
+    def test_requests_are_reproducible(self):
+        """ Test that the same seed generates the same requests """
+        mix = parse_mix('small=0.5,large=0.5')
+
+        self.assertEqual(build_requests(mix, 20, seed=1), build_requests(mix, 20, seed=1))
+
+    def test_packer_per_kind(self):
+        """ Test that small requests reach packaide, while rects requests take the rectangle packer """
+        for kind, body in build_requests(parse_mix('small=1,rects=1'), 20, seed=1):
+            rectangles = find_rectangles(combine_svg(body['shapes']))
+
+            if kind == 'rects':
+                self.assertIsNotNone(rectangles)
+            else:
+                self.assertIsNone(rectangles)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+import math
+import unittest
+
+from errors import NO_SHAPE_FITS
+from preview import preview_pack
+from utils import combine_svg, generate_sheet
+
+
+class TestPreviewPack(unittest.TestCase):
+    def test_flagged_as_approximate(self):
+        """ Test that previews are clearly marked as estimates """
+        shapes = combine_svg(['<svg><rect width="10" height="10" /></svg>'])
+
+        preview = preview_pack(shapes, generate_sheet(100, 100, dpi=1), offset=0, rotations=4)
+
+        self.assertTrue(preview['approximate'])
+
+    def test_sheet_count_and_utilization(self):
+        """ Test the estimated sheet count and utilization """
+        shapes = combine_svg(['<svg><rect width="60" height="60" /></svg>'] * 3)
+
+        preview = preview_pack(shapes, generate_sheet(100, 100, dpi=1), offset=0, rotations=4)
+
+        self.assertEqual(3, preview['sheet_count'])
+        self.assertAlmostEqual(0.36, preview['utilization'])
+
+    def test_curved_shapes(self):
+        """ Test that curved shapes are placed by their bounding box """
+        shapes = combine_svg(['<svg><circle r="40" /><circle r="40" /><ellipse rx="50" ry="10" /></svg>'])
+
+        preview = preview_pack(shapes, generate_sheet(100, 100, dpi=1), offset=0, rotations=4)
+
+        self.assertEqual(2, preview['sheet_count'])
+        self.assertEqual([0, 1, 2], [placement['index'] for placement in preview['placements']])
+        self.assertAlmostEqual(80, preview['placements'][0]['width'], delta=0.5)
+
+    def test_utilization_of_circles(self):
+        """ Test that utilization is based on the area of the shape rather than its bounding box """
+        shapes = combine_svg(['<svg><circle r="50" /></svg>'])
+
+        preview = preview_pack(shapes, generate_sheet(100, 100, dpi=1), offset=0, rotations=4)
+
+        self.assertAlmostEqual(math.pi / 4, preview['utilization'], delta=0.01)
+
+    def test_shapes_too_large(self):
+        """ Test that the same errors as a full pack are raised """
+        shapes = combine_svg(['<svg><rect width="200" height="200" /></svg>'])
+
+        with self.assertRaises(ValueError) as context:
+            preview_pack(shapes, generate_sheet(100, 100, dpi=1), offset=0, rotations=4)
+        self.assertEqual(NO_SHAPE_FITS, str(context.exception))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,114 @@
+import unittest
+from xml.etree import ElementTree
+
+from errors import NO_SHAPE_FITS, ONE_SHAPE_TOO_BIG
+from geometry import bounding_box, outlines
+from rectpack import find_rectangles, pack_rectangles, place_rectangles
+from utils import combine_svg, generate_sheet
+
+
+def _placed_boxes(sheet_as_str: str) -> list[tuple[float, float, float, float]]:
+    sheet = ElementTree.fromstring(sheet_as_str)
+    return [bounding_box(outlines(child)[0]) for child in sheet]
+
+
+class TestFindRectangles(unittest.TestCase):
+    def test_rectangular_shapes(self):
+        """ Test that rects, rectangular paths, and rectangular polygons are detected """
+        shapes = combine_svg(["""
+        <svg>
+          <rect width="10" height="20" />
+          <path d="M 0 0 H 10 V 5 H 0 Z" />
+          <polygon points="5,5 15,5 15,10 5,10" />
+          <g transform="translate(10 10) rotate(90)"><rect width="4" height="8" /></g>
+        </svg>
+        """])
+
+        parts = find_rectangles(shapes)
+
+        self.assertEqual(4, len(parts))
+        self.assertEqual((8, 4), (parts[3].width, parts[3].height))
+
+    def test_non_rectangular_shapes(self):
+        """ Test that any non-rectangular shape disables the fast path """
+        for shape in ('<circle r="5" />',
+                      '<rect width="10" height="10" rx="2" />',
+                      '<rect width="10" height="10" transform="rotate(45)" />',
+                      '<path d="M 0 0 H 10 V 10 Z" />',
+                      '<polygon points="0,0 10,0 10,10 5,5 0,10" />'):
+            shapes = combine_svg(['<svg><rect width="10" height="20" />{}</svg>'.format(shape)])
+
+            self.assertIsNone(find_rectangles(shapes), shape)
+
+
+class TestPlaceRectangles(unittest.TestCase):
+    def test_single_sheet(self):
+        """ Test that parts which fit on one sheet are not split across sheets """
+        placements, failed = place_rectangles([(50, 50)] * 4, 100, 100, offset=0, allow_rotation=False)
+
+        self.assertEqual([], failed)
+        self.assertEqual({0}, {placement.sheet for placement in placements})
+
+    def test_offset_opens_new_sheet(self):
+        """ Test that the offset between parts is honored """
+        placements, _ = place_rectangles([(50, 50)] * 2, 100, 50, offset=1, allow_rotation=False)
+
+        self.assertEqual([0, 1], [placement.sheet for placement in placements])
+
+    def test_rotation(self):
+        """ Test that parts are rotated by 90 degrees only when allowed """
+        placements, failed = place_rectangles([(10, 100)], 100, 10, offset=0, allow_rotation=True)
+        self.assertEqual([], failed)
+        self.assertTrue(placements[0].rotated)
+
+        _, failed = place_rectangles([(10, 100)], 100, 10, offset=0, allow_rotation=False)
+        self.assertEqual([0], failed)
+
+
+class TestPackRectangles(unittest.TestCase):
+    def test_no_overlap(self):
+        """ Test that placed parts stay on the sheet and keep `offset` apart """
+        offset = 2
+        shapes = combine_svg(['<svg><rect width="30" height="20" /><rect width="25" height="40" x="5" /></svg>'] * 4)
+        sheet = generate_sheet(100, 100, dpi=1)
+
+        outputs = pack_rectangles(find_rectangles(shapes), sheet, offset=offset, rotations=4)
+
+        self.assertEqual(8, sum(len(ElementTree.fromstring(output)) for output in outputs))
+        for output in outputs:
+            boxes = _placed_boxes(output)
+            for i, a in enumerate(boxes):
+                self.assertGreaterEqual(a[0], -1e-9)
+                self.assertGreaterEqual(a[1], -1e-9)
+                self.assertLessEqual(a[2], 100 + 1e-9)
+                self.assertLessEqual(a[3], 100 + 1e-9)
+                for b in boxes[i + 1:]:
+                    separated = a[2] + offset <= b[0] + 1e-9 or b[2] + offset <= a[0] + 1e-9 or \
+                        a[3] + offset <= b[1] + 1e-9 or b[3] + offset <= a[1] + 1e-9
+                    self.assertTrue(separated)
+
+    def test_output_size(self):
+        """ Test that output sheets keep the viewBox of the sheet """
+        shapes = combine_svg(['<svg><rect width="30" height="20" /></svg>'])
+        sheet = generate_sheet(200, 100, dpi=1)
+
+        outputs = pack_rectangles(find_rectangles(shapes), sheet, offset=0, rotations=4)
+
+        self.assertEqual('0 0 200 100', ElementTree.fromstring(outputs[0]).attrib['viewBox'])
+
+    def test_errors(self):
+        """ Test that the same errors as `perform_pack` are raised """
+        sheet = generate_sheet(50, 50, dpi=1)
+
+        with self.assertRaises(ValueError) as context:
+            pack_rectangles(find_rectangles('<svg><rect width="100" height="100" /></svg>'), sheet, 0, 4)
+        self.assertEqual(NO_SHAPE_FITS, str(context.exception))
+
+        with self.assertRaises(ValueError) as context:
+            pack_rectangles(find_rectangles('<svg><rect width="10" height="10" /><rect width="100" height="100" />'
+                                            '</svg>'), sheet, 0, 4)
+        self.assertEqual(ONE_SHAPE_TOO_BIG, str(context.exception))
+
+
+if __name__ == '__main__':
+    unittest.main()
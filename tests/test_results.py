@@ -0,0 +1,121 @@
+import os
+import tempfile
+import time
+import unittest
+
+from results import ResultStore, etag_matches, parse_range
+
+
+def _generate_sheets(count: int) -> list[str]:
+    return ['<svg viewBox="0 0 10 10"><rect width="{}" height="1" /></svg>'.format(i + 1) for i in range(count)]
+
+
+class TestResultStore(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.store = ResultStore(self.directory.name, ttl=60)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_save_and_read(self):
+        """ Test that saved sheets can be read back individually """
+        sheets = _generate_sheets(3)
+
+        manifest = self.store.save(sheets)
+
+        self.assertEqual(3, manifest['sheet_count'])
+        for index, sheet in enumerate(sheets):
+            self.assertEqual(sheet, self.store.read_sheet(manifest['id'], index))
+
+    def test_distinct_etags(self):
+        """ Test that each sheet has an ETag derived from its content """
+        manifest = self.store.save(_generate_sheets(2))
+
+        etags = {entry['etag'] for entry in manifest['sheets']}
+
+        self.assertEqual(2, len(etags))
+
+    def test_missing_result(self):
+        """ Test that unknown ids and out of range sheets raise `KeyError` """
+        manifest = self.store.save(_generate_sheets(1))
+
+        with self.assertRaises(KeyError):
+            self.store.manifest('0' * 32)
+        with self.assertRaises(KeyError):
+            self.store.sheet(manifest['id'], 1)
+        with self.assertRaises(KeyError):
+            self.store.manifest('../etc')
+
+    def test_expired_result_is_evicted(self):
+        """ Test that results are removed once their TTL has passed """
+        store = ResultStore(self.directory.name, ttl=0)
+        manifest = store.save(_generate_sheets(1))
+
+        with self.assertRaises(KeyError):
+            store.manifest(manifest['id'])
+        self.assertFalse(os.path.exists(os.path.join(self.directory.name, manifest['id'])))
+
+    def test_evict_on_save(self):
+        """ Test that saving a result evicts every expired result """
+        store = ResultStore(self.directory.name, ttl=0, eviction_interval=0)
+        first = store.save(_generate_sheets(1))
+        time.sleep(0.01)
+
+        store.save(_generate_sheets(1))
+
+        self.assertFalse(os.path.exists(os.path.join(self.directory.name, first['id'])))
+
+    def test_eviction_is_throttled(self):
+        """ Test that the store is not scanned for expired results more than once per interval """
+        store = ResultStore(self.directory.name, ttl=0, eviction_interval=60)
+        store.save(_generate_sheets(1))
+        first = store.save(_generate_sheets(1))
+        time.sleep(0.01)
+
+        store.save(_generate_sheets(1))
+
+        self.assertTrue(os.path.exists(os.path.join(self.directory.name, first['id'])))
+        with self.assertRaises(KeyError):
+            store.manifest(first['id'])
+
+
+class TestParseRange(unittest.TestCase):
+    def test_bounded_range(self):
+        self.assertEqual((10, 19), parse_range('bytes=10-19', 100))
+
+    def test_open_range(self):
+        self.assertEqual((90, 99), parse_range('bytes=90-', 100))
+
+    def test_range_is_clamped(self):
+        self.assertEqual((90, 99), parse_range('bytes=90-500', 100))
+
+    def test_unsatisfiable_range(self):
+        with self.assertRaises(ValueError):
+            parse_range('bytes=100-', 100)
+
+    def test_ignored_ranges(self):
+        """ Test that multiple ranges and other units are ignored """
+        self.assertIsNone(parse_range('bytes=0-1,5-6', 100))
+        self.assertIsNone(parse_range('items=0-1', 100))
+
+    def test_invalid_range_is_ignored(self):
+        """ Test that a range which ends before it starts is ignored rather than unsatisfiable """
+        self.assertIsNone(parse_range('bytes=5-2', 100))
+
+
+class TestEtagMatches(unittest.TestCase):
+    def test_strong_tag(self):
+        self.assertTrue(etag_matches('"a", "b"', '"b"'))
+        self.assertFalse(etag_matches('"a"', '"b"'))
+
+    def test_weak_tag(self):
+        """ Test that weak tags match, since `If-None-Match` uses weak comparison """
+        self.assertTrue(etag_matches('W/"b"', '"b"'))
+
+    def test_wildcard(self):
+        self.assertTrue(etag_matches('*', '"b"'))
+
+
+if __name__ == '__main__':
+    unittest.main()
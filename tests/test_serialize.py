@@ -0,0 +1,140 @@
+import json
+import math
+import unittest
+from random import Random
+from xml.etree import ElementTree
+
+from geometry import outlines, parse_path
+from serialize import format_number, iter_json_sheets, iter_lean_svg, minimum_precision, round_path
+
+
+def _generate_sheet():
+    return """<svg xmlns="http://www.w3.org/2000/svg" xmlns:svg="http://www.w3.org/2000/svg" viewBox="0 0 960 480">
+      <g transform="translate(100.123456789, 20.987654321) rotate(30)">
+        <path d="M 0 0 L 50.00000001 0 A 25.5 25.5 0 0 1 50 51 Z" />
+      </g>
+      <g transform="translate(300, 300)">
+        <rect x="0.333333333" y="1.666666666" width="99.99999999" height="10" transform="scale(1.5)" />
+      </g>
+    </svg>"""
+
+
+def _generate_scaled_sheet():
+    return """<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 960 480">
+      <rect x="0.1234" y="0.4321" width="5.5555" height="3.3333" transform="scale(100)" />
+      <g transform="translate(0.12345 0.6789) scale(20)">
+        <g transform="translate(0.12345 0.6789) rotate(10)">
+          <path d="m 0.1234 0.1234 l 0.1234 0 0.1234 0 0.1234 0 0.1234 0 0.1234 0 a 0.55 0.55 0 0 1 1.1 0 z" />
+        </g>
+      </g>
+    </svg>"""
+
+
+class TestFormatting(unittest.TestCase):
+    def test_format_number(self):
+        """ Test that numbers are written without redundant characters """
+        self.assertEqual('0', format_number(-0.0001, 2))
+        self.assertEqual('.25', format_number(0.25, 2))
+        self.assertEqual('-1.5', format_number(-1.5, 2))
+        self.assertEqual('100', format_number(100.0, 2))
+
+    def test_round_path_arc_flags(self):
+        """ Test that compact arc flags are not mistaken for coordinates """
+        self.assertEqual('M0 0a5 5 0 0 1 5.5 5', round_path('M0 0a5 5 0 015.5 5', 2))
+
+    def test_round_path_negative_numbers(self):
+        """ Test that separators are dropped before negative numbers """
+        self.assertEqual('M1-1L-2.5-3', round_path('M 1.0001 -1 L -2.5 -3', 2))
+
+    def test_round_path_relative_error(self):
+        """ Test that rounding error does not accumulate along relative coordinates """
+        self.assertEqual('m0 0h0 .01 0 .01', round_path('m 0 0 h 0.004 0.004 0.004 0.004', 2))
+
+    def test_round_path_relative_arcs(self):
+        """ Test that relative arcs and lines stay within the rounding error of the original path """
+        random = Random(0)
+        segments = ['m 0.1234 0.5678']
+        for _ in range(120):
+            if random.random() < 0.5:
+                segments.append('a {0:.4f} {0:.4f} 0 0 1 {1:.4f} {2:.4f}'.format(
+                    random.uniform(5, 10), random.uniform(-3, 3), random.uniform(-3, 3)))
+            else:
+                segments.append('l {:.4f} {:.4f}'.format(random.uniform(-3, 3), random.uniform(0, 0.01)))
+        d = ' '.join(segments)
+
+        for precision in (1, 2, 3):
+            original = [point for polygon in parse_path(d) for point in polygon]
+            rounded = [point for polygon in parse_path(round_path(d, precision)) for point in polygon]
+            self.assertEqual(len(original), len(rounded))
+            for (x1, y1), (x2, y2) in zip(original, rounded):
+                self.assertLessEqual(math.hypot(x1 - x2, y1 - y2), 2 * 10 ** -precision)
+
+    def test_round_path_keeps_arc_radii(self):
+        """ Test that arc radii and rotations are not rounded """
+        self.assertEqual('M0 0A25.5555 25.5555 10.25 0 1 50 0', round_path('M0 0 A25.5555 25.5555 10.25 0 1 50 0', 1))
+
+    def test_minimum_precision(self):
+        """ Test that the precision always keeps rounding error within the tolerance """
+        for tolerance in (1, 0.5, 0.1, 0.01, 0.003):
+            precision = minimum_precision(tolerance)
+            self.assertLessEqual(2 * 10 ** -precision, tolerance)
+
+
+class TestLeanSVG(unittest.TestCase):
+    def assertWithinTolerance(self, sheet, tolerance):
+        lean = ''.join(iter_lean_svg(sheet, minimum_precision(tolerance)))
+
+        original = outlines(ElementTree.fromstring(sheet))
+        rounded = outlines(ElementTree.fromstring(lean))
+        self.assertEqual(len(original), len(rounded))
+        for polygon, rounded_polygon in zip(original, rounded):
+            for (x1, y1), (x2, y2) in zip(polygon, rounded_polygon):
+                self.assertLessEqual(math.hypot(x1 - x2, y1 - y2), tolerance)
+
+    def test_geometry_within_tolerance(self):
+        """ Test that rounded geometry stays within the tolerance of the original """
+        self.assertWithinTolerance(_generate_sheet(), 0.01)
+        self.assertWithinTolerance(_generate_scaled_sheet(), 0.1)
+
+    def test_scaled_precision(self):
+        """ Test that elements drawn at a larger scale keep more digits """
+        lean = ''.join(iter_lean_svg(_generate_scaled_sheet(), minimum_precision(0.1)))
+        svg = ElementTree.fromstring(lean)
+
+        self.assertEqual('.1234', svg[0].attrib['x'])
+
+    def test_smaller_output(self):
+        """ Test that the output is smaller than the input """
+        sheet = _generate_sheet()
+
+        lean = ''.join(iter_lean_svg(sheet, 2))
+
+        self.assertLess(len(lean), len(sheet))
+
+    def test_redundant_groups_are_folded(self):
+        """ Test that groups which only carry a transform are merged into their child """
+        lean = ''.join(iter_lean_svg(_generate_sheet(), 2))
+        svg = ElementTree.fromstring(lean)
+
+        self.assertEqual(2, len(svg))
+        self.assertTrue(svg[1].tag.endswith('rect'))
+        self.assertEqual('matrix(1.5 0 0 1.5 300 300)', svg[1].attrib['transform'])
+
+    def test_single_namespace_declaration(self):
+        """ Test that the SVG namespace is only declared once """
+        lean = ''.join(iter_lean_svg(_generate_sheet(), 2))
+
+        self.assertEqual(1, lean.count('xmlns'))
+
+    def test_json_stream(self):
+        """ Test that streamed sheets form a valid JSON array """
+        sheets = [_generate_sheet(), _generate_sheet()]
+
+        parsed = json.loads(''.join(iter_json_sheets(sheets, 3)))
+
+        self.assertEqual(2, len(parsed))
+        self.assertEqual(''.join(iter_lean_svg(sheets[0], 3)), parsed[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
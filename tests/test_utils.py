@@ -1,7 +1,8 @@
 import unittest
 from xml.etree import ElementTree
 
-from utils import _aggregate_svg_elements, _set_viewbox, combine_svg, generate_sheet, perform_pack
+from utils import _aggregate_svg_elements, _set_viewbox, combine_svg, generate_sheet, perform_pack, simplify_shapes, \
+    sort_shapes
 
 
 def _generate_shapes():
@@ -59,6 +60,109 @@ class TestCombineSVG(unittest.TestCase):
         self.assertEqual('0 0 100 100', combined.attrib['viewBox'])
 
 
+class TestSortShapes(unittest.TestCase):
+    """ Test the `sort_shapes()` function. """
+
+    def test_sort_by_area(self):
+        """ Test that the largest shapes by area are placed first """
+        shapes = combine_svg([_generate_shapes()])
+
+        sorted_as_str, order = sort_shapes(shapes, 'area')
+        sorted_shapes = ElementTree.fromstring(sorted_as_str)
+
+        # both rectangles have equal area and keep their submission order
+        self.assertEqual([0, 1, 2], order)
+        self.assertTrue(sorted_shapes[2].tag.endswith('ellipse'))
+
+    def test_sort_by_bbox(self):
+        """ Test ordering by the longest side of the bounding box """
+        shapes = combine_svg(["""
+        <svg>
+          <rect width="10" height="10" />
+          <rect width="100" height="1" />
+        </svg>
+        """])
+
+        _, order = sort_shapes(shapes, 'bbox')
+
+        self.assertEqual([1, 0], order)
+
+    def test_sort_by_hull(self):
+        """ Test ordering by convex hull area """
+        shapes = combine_svg(["""
+        <svg>
+          <polygon points="0,0 10,0 10,10 0,10" />
+          <polygon points="0,0 20,0 20,20 19,20 19,1 0,1" />
+        </svg>
+        """])
+
+        _, order = sort_shapes(shapes, 'hull')
+
+        self.assertEqual([1, 0], order)
+
+    def test_shapes_are_preserved(self):
+        """ Test that no shapes are lost while sorting """
+        shapes = combine_svg([_generate_shapes(), _generate_shapes()])
+
+        sorted_as_str, order = sort_shapes(shapes, 'hull')
+
+        self.assertEqual(6, len(ElementTree.fromstring(sorted_as_str)))
+        self.assertEqual(list(range(6)), sorted(order))
+
+    def test_groups_are_flattened(self):
+        """ Test that shapes inside groups are sorted individually, keeping their transforms and styles """
+        shapes = combine_svg(["""
+        <svg>
+          <g transform="translate(5 0)" stroke="red" style="fill:none">
+            <rect width="10" height="10" />
+            <rect width="100" height="50" transform="scale(2)" style="stroke-width:2" />
+          </g>
+          <rect width="30" height="30" />
+        </svg>
+        """])
+
+        sorted_as_str, order = sort_shapes(shapes, 'area')
+        sorted_shapes = ElementTree.fromstring(sorted_as_str)
+
+        self.assertEqual([1, 2, 0], order)
+        self.assertEqual(3, len(sorted_shapes))
+        largest = sorted_shapes[0]
+        self.assertEqual('matrix(2.0 0.0 0.0 2.0 5.0 0.0)', largest.attrib['transform'])
+        self.assertEqual('red', largest.attrib['stroke'])
+        self.assertEqual('fill:none;stroke-width:2', largest.attrib['style'])
+        self.assertNotIn('transform', sorted_shapes[1].attrib)
+
+
+class TestSimplifyShapes(unittest.TestCase):
+    """ Test the `simplify_shapes()` function. """
+
+    def test_shape_count(self):
+        """ Test that every leaf shape becomes exactly one path """
+        shapes = combine_svg([_generate_shapes(), '<svg><g><rect width="1" height="1" /><circle r="2" /></g></svg>'])
+
+        simplified = ElementTree.fromstring(simplify_shapes(shapes, 0.5))
+
+        self.assertEqual(5, len(simplified))
+        self.assertEqual('0 0 100 100', simplified.attrib['viewBox'])
+
+    def test_vertices_removed(self):
+        """ Test that a coarser epsilon leaves fewer vertices """
+        shapes = combine_svg(['<svg><ellipse rx="20" ry="20" /></svg>'])
+
+        fine = ElementTree.fromstring(simplify_shapes(shapes, 0.01))
+        coarse = ElementTree.fromstring(simplify_shapes(shapes, 2))
+
+        self.assertLess(len(coarse[0].attrib['d']), len(fine[0].attrib['d']))
+
+    def test_no_outline(self):
+        """ Test that shapes without an outline are rejected rather than packed as empty paths """
+        for shape in ('<svg><line x1="0" y1="0" x2="10" y2="10" /></svg>', '<svg><image width="5" height="5" /></svg>'):
+            shapes = combine_svg(['<svg><rect width="1" height="1" /></svg>', shape])
+
+            with self.assertRaises(ValueError):
+                simplify_shapes(shapes, 0.5)
+
+
 class TestGenerateSheet(unittest.TestCase):
     """ Test the `generate_sheet()` function. """
 
@@ -180,6 +284,15 @@ class TestPerformPacking(unittest.TestCase):
 
         self.assertEqual(number_of_shapes, shape_counter)
 
+    def test_progressive(self):
+        """ Test that progressive mode finds the same number of sheets """
+        shapes = _generate_shapes_with_viewbox()
+        sheet = generate_sheet(125, 125, 1)
+
+        outputs = perform_pack(shapes, sheet, tolerance=0.1, offset=0.1, rotations=4, progressive=True)
+
+        self.assertEqual(2, len(outputs))
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -1,12 +1,32 @@
+import copy
 import xml.etree.ElementTree as et
+from typing import Optional
 
-NO_SHAPE_FITS = "Sheet size is too small for shapes"
-ONE_SHAPE_TOO_BIG = "One shape is too large for sheet"
+from errors import NO_SHAPE_FITS, ONE_SHAPE_TOO_BIG
+from geometry import (IDENTITY, apply, bbox_max_side, element_polygons, hull_area, iter_shapes, local_name,
+                      shape_area, simplify)
+from library import ShapeLibrary, is_reference
+from rectpack import find_rectangles, pack_rectangles
 
+NO_OUTLINE = "Shape has no outline to simplify"
 
-def _aggregate_svg_elements(svg_list: list[str]) -> et.Element:
+# how much coarser than requested the tolerance is while discovering the sheet count in progressive mode
+COARSE_TOLERANCE_FACTOR = 10
+
+# heuristics available to `sort_shapes`
+SORT_KEYS = {
+    'area': shape_area,
+    'bbox': bbox_max_side,
+    'hull': hull_area,
+}
+
+
+def _aggregate_svg_elements(svg_list: list[str], library: Optional[ShapeLibrary] = None) -> et.Element:
     """ Combine a list of SVG strings into a single SVG XML element
 
+    When a `library` is given, entries may also be ids of registered shapes. Their elements were parsed when the
+    shape was registered, so they are appended without being parsed again.
+
     Example:
         >>> svg1 = '<svg><circle cx="50" cy="50" r="40" fill="red" /></svg>'
         >>> svg2 = '<svg><rect width="80" height="80" fill="blue" /></svg>'
@@ -18,10 +38,13 @@ def _aggregate_svg_elements(svg_list: list[str]) -> et.Element:
     combined_svg = et.Element('svg', {'xmlns': 'http://www.w3.org/2000/svg'})
 
     for svg_string in svg_list:
-        root = et.fromstring(svg_string)
+        if library is not None and is_reference(svg_string):
+            children = library.resolve(svg_string).elements
+        else:
+            children = et.fromstring(svg_string)
 
         # Append each child element of the SVG to the combined SVG
-        for child in root:
+        for child in children:
             combined_svg.append(child)
 
     return combined_svg
@@ -40,23 +63,98 @@ def _set_viewbox(svg: et.Element) -> et.Element:
     return svg
 
 
-def combine_svg(svg_list: list[str]) -> str:
+def combine_svg(svg_list: list[str], library: Optional[ShapeLibrary] = None) -> str:
     """ Combine multiple SVG files and return a string.
 
     All inner children of the SVG elements are combined into a single SVG element. The viewBox of the resulting SVG
-    is set to a fixed size. The resulting SVG is returned as a string.
+    is set to a fixed size. The resulting SVG is returned as a string. Ids of shapes registered in `library` may be
+    mixed with inline SVG strings.
 
     Example:
         >>> svg1 = '<svg><circle cx="50" cy="50" r="40" fill="red" /></svg>'
         >>> svg2 = '<svg><rect width="80" height="80" fill="blue" /></svg>'
         >>> _combined: str = combine_svg([svg1, svg2])
     """
-    combined = _aggregate_svg_elements(svg_list)
+    combined = _aggregate_svg_elements(svg_list, library)
     combined = _set_viewbox(combined)
 
     return et.tostring(combined).decode('utf8')
 
 
+def _flatten_shapes(svg: et.Element) -> tuple[list[et.Element], list[et.Element]]:
+    """ Split a combined SVG into its non-geometric top-level elements and a flat list of its leaf shapes.
+
+    Each leaf is copied with the transforms of its groups composed into its own `transform`. Attributes of its groups
+    are inherited unless the leaf sets them, and group styles are placed before the leaf's own, so leaves keep their
+    appearance once moved to the top level.
+    """
+    parents = {child: parent for parent in svg.iter() for child in parent}
+
+    others = []
+    leaves = []
+    for child in svg:
+        shapes = list(iter_shapes(child))
+        if not shapes and local_name(child) not in ('g', 'svg', 'a'):
+            others.append(child)
+
+        for element, matrix in shapes:
+            leaf = copy.deepcopy(element)
+            leaf.tail = None
+
+            ancestor = parents[element]
+            while ancestor is not svg:
+                for name, value in ancestor.attrib.items():
+                    if name == 'style' and 'style' in leaf.attrib:
+                        leaf.attrib['style'] = value.rstrip('; ') + ';' + leaf.attrib['style']
+                    elif name not in ('transform', 'id'):
+                        leaf.attrib.setdefault(name, value)
+                ancestor = parents[ancestor]
+
+            if matrix == IDENTITY:
+                leaf.attrib.pop('transform', None)
+            else:
+                leaf.attrib['transform'] = 'matrix({})'.format(' '.join(repr(value) for value in matrix))
+            leaves.append(leaf)
+
+    return others, leaves
+
+
+def sort_shapes(shapes: str, key: str) -> tuple[str, list[int]]:
+    """ Reorder the shapes of a combined SVG, largest first.
+
+    `packaide` places shapes greedily in the order they are given, so placing large parts first usually requires
+    fewer sheets. `packaide` treats every leaf element as a separate part, so groups are flattened and each leaf
+    shape is ordered on its own by the chosen heuristic, in descending order. The sort is stable, so equally sized
+    shapes keep their submission order.
+
+    Parameters:
+        shapes (str): A combined SVG string as returned by `combine_svg`.
+        key (str): The heuristic to order by. One of `'area'`, `'bbox'` (longest bounding box side) or `'hull'`
+            (convex hull area).
+
+    Returns:
+        The reordered SVG string, and the original index of each leaf shape in its new order. Leaves are numbered
+        in document order, as in the placements of `preview_pack`.
+
+    Example:
+        >>> _shapes = combine_svg(['<svg><g><rect width="1" height="1" /><rect width="5" height="5" /></g></svg>'])
+        >>> sort_shapes(_shapes, 'area')[1]
+        [1, 0]
+    """
+    measure = SORT_KEYS[key]
+
+    svg = et.fromstring(shapes)
+    others, leaves = _flatten_shapes(svg)
+    order = sorted(range(len(leaves)), key=lambda i: measure(leaves[i]), reverse=True)
+
+    for child in list(svg):
+        svg.remove(child)
+    svg.extend(others)
+    svg.extend(leaves[i] for i in order)
+
+    return et.tostring(svg).decode('utf8'), order
+
+
 def generate_sheet(width: float, height: float, dpi: int = 96) -> str:
     """ Generate an SVG sheet with a given height and width.
 
@@ -82,43 +180,57 @@ def generate_sheet(width: float, height: float, dpi: int = 96) -> str:
     return sheet
 
 
-def perform_pack(shapes: str, sheet: str,
-                 tolerance: float,
-                 offset: float,
-                 rotations: int
-                 ) -> list[str]:
-    """ Perform the packing operation.
+def simplify_shapes(shapes: str, epsilon: float) -> str:
+    """ Replace every shape of a combined SVG with a simplified outline.
 
-    The `packaide.pack` function is called with the given shapes and sheet. The resulting SVGs are returned as a list
-    of strings.
+    Groups are flattened, and each leaf shape becomes a single top-level `<path>` in absolute coordinates, with
+    curves flattened and vertices within `epsilon` of the outline removed. `packaide` treats every leaf as a part,
+    so the number of parts is unchanged and packing results remain comparable. Outlines with fewer than three
+    vertices, such as lines, enclose nothing and are dropped.
 
-    Parameters:
-        shapes (str): A single SVG string, or a list of SVG strings, to pack onto the sheet.
-        sheet (str): An SVG string representing the sheet to pack onto.
-        tolerance (float): The tolerance of the packing algorithm.
-        offset (float): The offset of the packing algorithm.
-        rotations (int): The number of rotations to use.
+    Removed vertices lie within `epsilon` of the simplified outline, so each simplified shape may be up to
+    `epsilon` smaller than the original.
 
     Raises:
-        `ValueError` when:
-            - Sheet size is too small to fit any shape
-            - One shape is too large to fit onto sheet
+        `ValueError` when a shape has no outline left, such as an `<image>` or a `<line>`
 
     Example:
-        >>> _shapes = '<svg viewBox="0 0 100 100"><circle cx="50" cy="50" r="40" fill="red" /></svg>'
-        >>> _sheet = '<svg viewBox="0 0 1 1"></svg>'
-        >>> _ = perform_pack(_shapes, _sheet)
+        >>> _shapes = '<svg><g transform="translate(5 0)"><circle r="10" /></g><rect width="2" height="2" /></svg>'
+        >>> len(et.fromstring(simplify_shapes(_shapes, 1)))
+        2
     """
-    import packaide
+    root = et.fromstring(shapes)
+    simplified = _set_viewbox(et.Element('svg', {'xmlns': 'http://www.w3.org/2000/svg'}))
+
+    for child in root:
+        for element, matrix in iter_shapes(child):
+            subpaths = []
+            for polygon in element_polygons(element):
+                points = simplify([apply(matrix, point) for point in polygon], epsilon)
+                if len(points) >= 3:
+                    subpaths.append('M ' + ' L '.join('{!r} {!r}'.format(x, y) for x, y in points) + ' Z')
+            if not subpaths:
+                raise ValueError(NO_OUTLINE)
+            et.SubElement(simplified, 'path', {'d': ' '.join(subpaths)})
+
+    return et.tostring(simplified).decode('utf8')
 
+
+def _pack_until_placed(packaide, shapes: str, sheet: str, sheet_count: int,
+                       tolerance: float, offset: float, rotations: int, stats: dict) -> tuple[list, int]:
+    """ Call `packaide.pack`, adding a sheet each time a shape fails to be placed.
+
+    Returns:
+        The results of `packaide.pack`, and the number of sheets used.
+    """
     # get the number of shapes
     shapes_as_xml = et.fromstring(shapes)
     total_number_of_shapes = len(shapes_as_xml)
 
-    sheet_count = 1     # number of sheets to use
-
     # this continues to run until there are no failed placed sheets
     while True:
+        stats['iterations'] += 1
+
         results, _, failed = packaide.pack(
             [sheet] * sheet_count,
             shapes,
@@ -130,7 +242,7 @@ def perform_pack(shapes: str, sheet: str,
         )
 
         if failed == 0:
-            break
+            return results, sheet_count
         elif failed == total_number_of_shapes:
             raise ValueError(NO_SHAPE_FITS)
         elif sheet_count > total_number_of_shapes:
@@ -138,6 +250,72 @@ def perform_pack(shapes: str, sheet: str,
         else:
             sheet_count += 1
 
+
+def perform_pack(shapes: str, sheet: str,
+                 tolerance: float,
+                 offset: float,
+                 rotations: int,
+                 stats: Optional[dict] = None,
+                 progressive: bool = False
+                 ) -> list[str]:
+    """ Perform the packing operation.
+
+    The `packaide.pack` function is called with the given shapes and sheet. The resulting SVGs are returned as a list
+    of strings. When every shape is an axis-aligned rectangle, a dedicated rectangle packer is used instead.
+
+    In progressive mode, the number of sheets is first discovered using simplified shapes and a tolerance
+    `COARSE_TOLERANCE_FACTOR` times coarser. Simplified shapes may be smaller than the originals, so the coarse pass
+    keeps them further apart to avoid underestimating the sheet count. A single pack at the requested tolerance
+    then follows, adding sheets only if the coarse estimate was still too low. When any shape has no outline to
+    simplify, the coarse pass is skipped.
+
+    Parameters:
+        shapes (str): A single SVG string, or a list of SVG strings, to pack onto the sheet.
+        sheet (str): An SVG string representing the sheet to pack onto.
+        tolerance (float): The tolerance of the packing algorithm.
+        offset (float): The offset of the packing algorithm.
+        rotations (int): The number of rotations to use.
+        stats (dict): Optional. When given, `iterations` is set to the number of times `packaide.pack` was called.
+        progressive (bool): Discover the number of sheets at a coarse tolerance first. Defaults to False.
+
+    Raises:
+        `ValueError` when:
+            - Sheet size is too small to fit any shape
+            - One shape is too large to fit onto sheet
+
+    Example:
+        >>> _shapes = '<svg viewBox="0 0 100 100"><circle cx="50" cy="50" r="40" fill="red" /></svg>'
+        >>> _sheet = '<svg viewBox="0 0 1 1"></svg>'
+        >>> _ = perform_pack(_shapes, _sheet)
+    """
+    if stats is None:
+        stats = {}
+    stats['iterations'] = 0     # number of calls to `packaide.pack`
+
+    # jobs made entirely of axis-aligned rectangles skip packaide's polygon nesting
+    rectangles = find_rectangles(shapes)
+    if rectangles is not None:
+        return pack_rectangles(rectangles, sheet, offset=offset, rotations=rotations)
+
+    import packaide
+
+    sheet_count = 1     # number of sheets to use
+
+    if progressive:
+        coarse_tolerance = tolerance * COARSE_TOLERANCE_FACTOR
+
+        # each of two neighbouring shapes may shrink by up to `coarse_tolerance` when simplified
+        coarse_offset = offset + 2 * coarse_tolerance
+        try:
+            _, sheet_count = _pack_until_placed(packaide, simplify_shapes(shapes, coarse_tolerance), sheet, 1,
+                                                coarse_tolerance, coarse_offset, rotations, stats)
+        except ValueError:
+            # coarse geometry may not fit where the exact shapes do, or some shapes have no outline to simplify,
+            # so leave the decision to the final pass
+            sheet_count = 1
+
+    results, _ = _pack_until_placed(packaide, shapes, sheet, sheet_count, tolerance, offset, rotations, stats)
+
     sheets: list[str] = []
     for _, out in results:
         sheets.append(out)